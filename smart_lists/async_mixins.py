@@ -0,0 +1,174 @@
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from typing import TYPE_CHECKING
+
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.translation import gettext as _
+from django.views.generic.base import ContextMixin
+
+from smart_lists.mixins import SmartListMixin
+
+if TYPE_CHECKING:
+    from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+
+class AsyncSmartListMixin(SmartListMixin):
+    """
+    SmartListMixin for ASGI which runs the independent queries of a list page concurrently: the count, the rows
+    of the page, the values of every filter and the filter counts. The page is rendered once all of them are done,
+    so it takes about as long as the slowest query instead of all of them together.
+
+    Each query runs in a thread of its own with its own database connection, which is closed afterwards, so
+    the queries don't see uncommitted changes of the request (e.g. with ATOMIC_REQUESTS). Set
+    `concurrent_queries = False` to run them one after another in the thread of the request.
+
+    Exports, background export jobs, conditional responses and the response cache are handled like
+    in SmartListMixin, except that exports are buffered before Django 4.2 (see `ahandle_export`).
+    Override `aget_context_data` instead of `get_context_data`.
+    """
+
+    concurrent_queries = True
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super(AsyncSmartListMixin, cls).as_view(**initkwargs)
+        if asyncio.iscoroutinefunction(view):  # Django 4.1+ runs views with async handlers asynchronously
+            return view
+
+        async def async_view(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+            return response
+
+        functools.update_wrapper(async_view, view)
+        return async_view
+
+    def to_async(self, func, concurrent=None):  # type: (Callable, bool) -> Callable
+        """Wrap a function which runs queries to be awaited, in a thread of its own if `concurrent`."""
+        if not (self.concurrent_queries if concurrent is None else concurrent):
+            return sync_to_async(func)
+
+        def run(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                connections.close_all()  # the connections of this thread only
+
+        return sync_to_async(run, thread_sensitive=False)
+
+    async def get(self, request, *args, **kwargs):
+        if self.export_query_parameter_name in request.GET and self.export_job_runner is None:
+            if not self.conditional_response:
+                return await self.ahandle_export(request)
+            etag, last_modified = await self.to_async(self.get_validators, concurrent=False)()
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await self.ahandle_export(request)
+            return self.add_validators(response, etag, last_modified)
+        if (
+            self.export_query_parameter_name in request.GET
+            or self.export_job_query_parameter_name in request.GET
+            or self.conditional_response
+            or self.response_cache_timeout is not None
+        ):
+            # these don't build the list page or need a query at most before they do
+            return await self.to_async(super(AsyncSmartListMixin, self).get, concurrent=False)(request, *args, **kwargs)
+
+        self.object_list = self.get_queryset()
+        if not self.get_allow_empty() and not await self.to_async(self.object_list.exists)():
+            raise Http404(
+                _('Empty list and “%(class_name)s.allow_empty” is False.') % {'class_name': self.__class__.__name__}
+            )
+        context = await self.aget_context_data()
+        return self.render_to_response(context)
+
+    async def aget_context_data(self, **kwargs):  # type: (Any) -> Dict[str, Any]
+        queryset = self.object_list
+        page_size = self.get_paginate_by(queryset)
+        paginator = page = page_number = None
+        object_list = queryset
+        queries = []
+        if page_size:
+            page_number = self.get_page_number()
+            if self.keyset_pagination or page_number is None or self.get_paginate_orphans():
+                # the page can't be found before the count is known, keyset pages are found with one query
+                paginator, page, object_list, is_paginated = await self.to_async(self.paginate_queryset)(
+                    queryset, page_size
+                )
+            else:
+                paginator = self.get_paginator(queryset, page_size, allow_empty_first_page=self.get_allow_empty())
+                bottom = (page_number - 1) * page_size
+                object_list = queryset[bottom : bottom + page_size]
+                queries.append(functools.partial(getattr, paginator, 'count'))
+        queries.append(functools.partial(len, object_list))
+
+        smart_list_settings = self.get_smart_list_settings()
+        smart_list = self.get_smart_list(object_list, smart_list_settings)
+        filter_queries = [smart_filter.get_values for smart_filter in smart_list.filters]
+        if self.list_filter_counts and filter_queries:
+            # the counts are shared by all filters, so they are counted before the filter values
+            queries.append(self.get_filter_counts)
+        else:
+            queries, filter_queries = queries + filter_queries, []
+        for batch in (queries, filter_queries):
+            await asyncio.gather(*(self.to_async(query)() for query in batch))
+
+        if page_size and page is None:
+            try:
+                page = paginator.page(paginator.validate_number(page_number))
+            except InvalidPage as e:
+                raise Http404(
+                    _('Invalid page (%(page_number)s): %(message)s') % {'page_number': page_number, 'message': str(e)}
+                )
+            page.object_list = object_list  # loaded already
+        context = {
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': page.has_other_pages() if page is not None else False,
+            'object_list': object_list,
+        }
+        context_object_name = self.get_context_object_name(queryset)
+        if context_object_name is not None:
+            context[context_object_name] = object_list
+        smart_list_settings['smart_list'] = smart_list
+        context['smart_list_settings'] = smart_list_settings
+        context.update(kwargs)
+        return ContextMixin.get_context_data(self, **context)
+
+    def get_page_number(self):  # type: () -> Optional[int]
+        """Return the requested page number, None if it depends on the count ('last') or is invalid."""
+        page = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            page_number = int(page)
+        except ValueError:
+            return None
+        return page_number if page_number >= 1 else None
+
+    async def ahandle_export(self, request):
+        """
+        Stream the export asynchronously on Django 4.2+. Older versions iterate streaming responses in the event loop,
+        where the rows can't be queried, so the whole export is built in memory first.
+        """
+        response = await self.to_async(self.handle_export, concurrent=False)(request)
+        if response.streaming:
+            if hasattr(response, 'is_async'):  # Django 4.2+ streams async iterators
+                response.streaming_content = self.aiterate(response.streaming_content)
+            else:
+                content = await self.to_async(lambda: b''.join(response.streaming_content), concurrent=False)()
+                response.streaming_content = [content]
+        return response
+
+    async def aiterate(self, iterator):  # type: (Iterator[bytes]) -> AsyncIterator[bytes]
+        """Iterate the export in the thread of the request, the rows may be read with a server-side cursor."""
+        next_chunk = self.to_async(functools.partial(next, iterator, None), concurrent=False)
+        while True:
+            chunk = await next_chunk()
+            if chunk is None:
+                return
+            yield chunk
@@ -0,0 +1,101 @@
+import hashlib
+import time
+
+from typing import TYPE_CHECKING
+
+from django.apps import apps
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.utils.cache import has_vary_header
+
+if TYPE_CHECKING:
+    from typing import Any, Iterable, List, Set, Text, Tuple
+
+CACHE_ALIAS = 'default'
+
+
+def _get_version_key(model):  # type: (type) -> Text
+    return 'smart_lists.version.{}'.format(model._meta.label_lower)
+
+
+def _new_version():  # type: () -> int
+    # versions are not reset to a number used before when they are evicted from the cache
+    return int(time.time() * 1000000)
+
+
+def get_models_version(*models):  # type: (type) -> Text
+    """
+    Return a stamp which changes whenever an object of any of the given models is saved or deleted.
+    Put it in cache keys so that the cached data is not used after the objects it was made from change.
+    """
+    watch_models(*models)
+    cache = caches[CACHE_ALIAS]
+    concrete_models = [model._meta.concrete_model for model in models]
+    keys = [_get_version_key(model) for model in concrete_models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+_watched_models = set()  # type: Set[type]
+
+
+def watch_models(*models):  # type: (type) -> None
+    """
+    Bump the version of the given models whenever their objects, or the objects of their proxy models, are saved
+    or deleted. Models are watched once their version is read, processes which change objects without reading any
+    version, like task workers, must watch the models of the cached lists themselves, e.g. in `AppConfig.ready`.
+    """
+    for model in models:
+        concrete_model = model._meta.concrete_model
+        if concrete_model in _watched_models:
+            continue
+        _watched_models.add(concrete_model)
+        # signals are sent with the class of the saved object, which may be a proxy
+        senders = {concrete_model}
+        senders.update(m for m in apps.get_models() if m._meta.concrete_model is concrete_model)
+        for sender in senders:
+            post_save.connect(bump_model_version, sender=sender, dispatch_uid='smart_lists_bump_model_version')
+            post_delete.connect(bump_model_version, sender=sender, dispatch_uid='smart_lists_bump_model_version')
+
+
+def bump_model_version(sender, **kwargs):
+    # the version may have been read by another process (web worker, task, shell), it is changed on every save
+    try:
+        caches[CACHE_ALIAS].incr(_get_version_key(sender._meta.concrete_model))
+    except ValueError:
+        pass  # there is no version yet or it was evicted, get_models_version starts a new one
+
+
+def is_visitor_specific(request, response=None):  # type: (Any, Any) -> bool
+    """
+    Tell whether the output rendered for the request must not be served to other visitors, because it contains the
+    CSRF token of the visitor (e.g. a form rendered with `csrf_token`) or the response sets or varies on cookies.
+    """
+    if request is not None and request.META.get('CSRF_COOKIE_USED'):
+        return True
+    return response is not None and bool(response.cookies or has_vary_header(response, 'Cookie'))
+
+
+def normalize_query_params(query_params, exclude=()):  # type: (Any, Iterable[Text]) -> List[Tuple[Text, List[Text]]]
+    """
+    Return query parameters sorted by name, without the excluded ones. The values keep their order and empty values
+    are kept, since views use the last value of a parameter and filter on empty values.
+    """
+    normalized = []
+    for key in sorted(query_params.keys()):
+        values = query_params.getlist(key) if hasattr(query_params, 'getlist') else [query_params[key]]
+        if key not in exclude:
+            normalized.append((key, [str(value) for value in values]))
+    return normalized
+
+
+def make_digest(*parts):  # type: (Any) -> Text
+    return hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+
+
+def make_cache_key(prefix, *parts):  # type: (Text, Any) -> Text
+    return 'smart_lists.{}.{}'.format(prefix, make_digest(*parts))
@@ -1,33 +1,67 @@
+import collections
+import copy
+import csv
+import datetime
+import itertools
+import multiprocessing
+import pickle
+import tempfile
+import zlib
 from abc import (
     ABCMeta,
     abstractmethod,
 )
+from concurrent.futures import ProcessPoolExecutor
 from typing import TYPE_CHECKING
 
 import six
 from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
 
-from django.db.models import Q
+import django
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q, prefetch_related_objects
+from django.utils import timezone
 
+from smart_lists.exceptions import SmartListException
 from smart_lists.helpers import SmartListItem
+from smart_lists.jobs import build_export_view, get_export_job_spec
+from smart_lists.pagination import KeysetPaginator
 
 if TYPE_CHECKING:
-    from typing import Any, Callable, Iterable, Optional
+    from concurrent.futures import Executor
+    from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+    from django.db.models import QuerySet
     from smart_lists.helpers import SmartList
 
 
 class SmartListExportBackend(six.with_metaclass(ABCMeta)):
+    # When True, `get_content` returns an iterable of bytes which is sent using a StreamingHttpResponse.
+    streaming = False
+    chunk_size = 2000
+    # render the rows in this many processes, the queryset is split into slices of `parallel_slice_size` rows
+    # on its ordering (primary key ranges when ordered by pk), which are put back together in order
+    parallel_processes = None  # type: Optional[int]
+    parallel_slice_size = 20000
+    # called with the number of exported items, set on a copy of the backend by background export jobs
+    progress_callback = None  # type: Optional[Callable[[int], None]]
+
     def __init__(
         self,
         verbose_name,
         file_name,
         extra_filters=None,
         limit=None,
-    ):  # type: (str, str, Union[Q, Callable[[], Q], None], Optional[int]) -> None
+        chunk_size=None,
+    ):  # type: (str, str, Union[Q, Callable[[], Q], None], Optional[int], Optional[int]) -> None
         self.verbose_name = verbose_name
         self.file_name = file_name
         self.extra_filters = extra_filters or Q()
         self.limit = limit
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
 
     @property
     @abstractmethod
@@ -35,29 +69,162 @@ class SmartListExportBackend(six.with_metaclass(ABCMeta)):
         """Return the response Content-Type."""
 
     @abstractmethod
-    def get_content(self, smart_list, value_renderer):  # type: (SmartList, Callable[[Any], str]) -> bytes
+    def get_content(
+        self, smart_list, value_renderer
+    ):  # type: (SmartList, Callable[[Any], str]) -> Union[bytes, Iterable[bytes]]
         """Given the SmartList to be exported, return the export file contents."""
 
-    def get_items(self, smart_list):  # type: (SmartList) -> Iterable[SmartListItem]
-        """Return an iterable of SmartListItem objects to be exported."""
+    def get_queryset(self, smart_list):  # type: (SmartList) -> QuerySet
+        """Return the queryset of the objects to be exported."""
         extra_filters = self.extra_filters() if callable(self.extra_filters) else self.extra_filters
         query_set = smart_list.object_list.filter(extra_filters)
         if self.limit is not None:
             query_set = query_set[: self.limit]
-        return (SmartListItem(smart_list, obj) for obj in query_set)
+        return query_set
+
+    def get_items(self, smart_list):  # type: (SmartList) -> Iterable[SmartListItem]
+        """Return an iterable of SmartListItem objects to be exported."""
+        items = (SmartListItem(smart_list, obj) for obj in self.iterate(self.get_queryset(smart_list)))
+        if self.progress_callback is not None:
+            items = self.report_progress(items)
+        return items
+
+    def iterate(self, query_set):  # type: (QuerySet) -> Iterator[Any]
+        """
+        Iterate the objects `chunk_size` rows at a time, without filling the queryset result cache, which would hold
+        every exported row in memory. PostgreSQL streams the rows with a server-side cursor. Prefetch lookups are
+        done for each chunk.
+        """
+        lookups = query_set._prefetch_related_lookups
+        if lookups:
+            query_set = query_set.prefetch_related(None)
+        iterator = query_set.iterator(chunk_size=self.chunk_size)
+        if not lookups:
+            for obj in iterator:
+                yield obj
+            return
+        for chunk in iter(lambda: list(itertools.islice(iterator, self.chunk_size)), []):
+            prefetch_related_objects(chunk, *lookups)
+            for obj in chunk:
+                yield obj
+
+    def get_row_renderer(
+        self, smart_list, value_renderer
+    ):  # type: (SmartList, Callable[[Any], str]) -> Callable[[SmartListItem], Any]
+        """Return a function rendering an item into a row of the export, the list of its values by default."""
+        return lambda item: [value_renderer(field.get_value()) for field in item.fields()]
+
+    def get_rows(self, smart_list, value_renderer):  # type: (SmartList, Callable[[Any], str]) -> Iterator[Any]
+        """Yield the rendered rows of the export in order."""
+        bounds = self.get_slice_bounds(smart_list) if self.can_export_in_parallel(smart_list) else None
+        if bounds is not None:
+            for row in self.get_rows_in_parallel(smart_list, bounds):
+                yield row
+            return
+        render = self.get_row_renderer(smart_list, value_renderer)
+        for item in self.get_items(smart_list):
+            yield render(item)
+
+    def can_export_in_parallel(self, smart_list):  # type: (SmartList) -> bool
+        """
+        Slices are exported by processes which rebuild the view of the list from its class path and request,
+        the view must be importable and provide `get_export_smart_list` (like SmartListMixin) for that.
+        The backend is sent to the processes, so callable `extra_filters` must be picklable (module level functions).
+        """
+        view = smart_list.view
+        if not self.parallel_processes or self.limit is not None or not hasattr(view, 'get_export_smart_list'):
+            return False
+        try:
+            pickle.dumps(self.extra_filters)
+        except (pickle.PicklingError, AttributeError, TypeError):  # e.g. a lambda
+            return False
+        return True
+
+    def get_executor(self):  # type: () -> Executor
+        return ProcessPoolExecutor(max_workers=self.parallel_processes, mp_context=multiprocessing.get_context('spawn'))
+
+    def get_slice_bounds(self, smart_list):
+        # type: (SmartList) -> Optional[List[Tuple[Optional[list], Optional[list]]]]
+        """
+        Return the ordering values of the last row before and the last row of each slice (None for the ends),
+        None if the ordering can't be sliced, e.g. by an expression.
+        """
+        try:
+            paginator = KeysetPaginator(self.get_queryset(smart_list), self.parallel_slice_size)
+        except SmartListException:
+            return None
+        paths = [term.path for term in paginator.terms]
+        last_rows = [
+            list(values)
+            for index, values in enumerate(paginator.object_list.values_list(*paths).iterator(), start=1)
+            if index % self.parallel_slice_size == 0
+        ]
+        return list(zip([None] + last_rows, last_rows + [None]))
+
+    def get_rows_in_parallel(self, smart_list, bounds):
+        # type: (SmartList, List[Tuple[Optional[list], Optional[list]]]) -> Iterator[Any]
+        """
+        Render the slices of the list between the bounds (see `get_slice_bounds`) in a pool of processes and yield
+        their rows in order. At most two slices per process are rendered ahead of the one being yielded, so memory
+        doesn't grow with the number of rows.
+        """
+        spec = get_export_job_spec(smart_list.view, None)
+        backend = copy.copy(self)
+        backend.progress_callback = None
+        backend.parallel_processes = None
+
+        executor = self.get_executor()
+        pending = collections.deque()
+        bounds = iter(bounds)
+        exported = 0
+        try:
+            for lower, upper in itertools.islice(bounds, 2 * self.parallel_processes):
+                pending.append(executor.submit(render_export_slice, spec, backend, lower, upper))
+            while pending:
+                rows = pending.popleft().result()
+                for lower, upper in itertools.islice(bounds, 1):
+                    pending.append(executor.submit(render_export_slice, spec, backend, lower, upper))
+                for row in rows:
+                    yield row
+                exported += len(rows)
+                if self.progress_callback is not None:
+                    self.progress_callback(exported)
+        finally:
+            executor.shutdown(wait=False)
+
+    def report_progress(self, items):  # type: (Iterable[SmartListItem]) -> Iterator[SmartListItem]
+        """Pass the number of items exported so far to `progress_callback` after every chunk and at the end."""
+        count = 0
+        for count, item in enumerate(items, start=1):
+            yield item
+            if count % self.chunk_size == 0:
+                self.progress_callback(count)
+        self.progress_callback(count)
 
 
 class SmartListExcelExportBackend(SmartListExportBackend):
 
     content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
+    def get_cell_value(self, value):  # type: (Any) -> Any
+        # Excel does not support timezones, so aware datetimes are written in the current timezone
+        if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+            return timezone.make_naive(value)
+        return value
+
+    def get_row(self, values):  # type: (Iterable[Any]) -> List[Any]
+        return [self.get_cell_value(value) for value in values]
+
+    def get_row_renderer(self, smart_list, value_renderer):
+        return lambda item: self.get_row(value_renderer(field.get_value()) for field in item.fields())
+
     def get_content(self, smart_list, value_renderer):  # type: (SmartList, Callable[[Any], str]) -> bytes
         wb = Workbook()
         ws = wb.active
 
-        ws.append([value_renderer(column.get_title()) for column in smart_list.get_columns()])
-        for item in self.get_items(smart_list):
-            ws.append([value_renderer(field.get_value()) for field in item.fields()])
+        ws.append(self.get_row(value_renderer(column.get_title()) for column in smart_list.get_columns()))
+        for row in self.get_rows(smart_list, value_renderer):
+            ws.append(row)
 
         # using a naive method of determining widths of columns
         for column_cells in ws.columns:
@@ -67,3 +234,157 @@ class SmartListExcelExportBackend(SmartListExportBackend):
         content = six.BytesIO()
         wb.save(content)
         return content.getvalue()
+
+
+class SmartListStreamingExcelExportBackend(SmartListExcelExportBackend):
+    """
+    Excel export with flat memory usage.
+
+    Rows are fetched in chunks and written to a write-only workbook, which keeps them in a temporary file
+    instead of in memory. The saved file is then sent to the client in chunks.
+    """
+
+    streaming = True
+    # write-only worksheets need column widths before the first row is written,
+    # so the widths are determined from this many leading rows
+    width_sample_size = 1000
+    file_chunk_size = 64 * 1024
+
+    def get_content(self, smart_list, value_renderer):  # type: (SmartList, Callable[[Any], str]) -> Iterator[bytes]
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+
+        rows = itertools.chain(
+            [self.get_row(value_renderer(column.get_title()) for column in smart_list.get_columns())],
+            self.get_rows(smart_list, value_renderer),
+        )
+        sample = list(itertools.islice(rows, self.width_sample_size + 1))
+        widths = {}
+        for row in sample:
+            for index, value in enumerate(row, start=1):
+                widths[index] = max(widths.get(index, 0), len(str(value)))
+        for index, width in widths.items():
+            ws.column_dimensions[get_column_letter(index)].width = width
+
+        for row in itertools.chain(sample, rows):
+            ws.append(row)
+
+        with tempfile.TemporaryFile() as content:
+            wb.save(content)
+            content.seek(0)
+            for chunk in iter(lambda: content.read(self.file_chunk_size), b''):
+                yield chunk
+
+
+class _Echo(object):
+    """File-like object which returns what is written to it, so csv.writer can produce one row at a time."""
+
+    def write(self, value):
+        return value
+
+
+class SmartListTextExportBackend(SmartListExportBackend):
+    """
+    Base class for line based text exports, written straight from `get_items` to the response.
+
+    When `compress` is set the content is gzipped on the fly, `file_name` should end with `.gz` in that case.
+    """
+
+    streaming = True
+    encoding = 'utf-8'
+    text_content_type = 'text/plain'
+
+    def __init__(self, verbose_name, file_name, extra_filters=None, limit=None, compress=False, chunk_size=None):
+        super(SmartListTextExportBackend, self).__init__(
+            verbose_name, file_name, extra_filters=extra_filters, limit=limit, chunk_size=chunk_size
+        )
+        self.compress = compress
+
+    @property
+    def content_type(self):  # type: () -> str
+        if self.compress:
+            return 'application/gzip'
+        return '{}; charset={}'.format(self.text_content_type, self.encoding)
+
+    @abstractmethod
+    def get_lines(self, smart_list, value_renderer):  # type: (SmartList, Callable[[Any], str]) -> Iterator[str]
+        """Given the SmartList to be exported, yield the lines of the export file."""
+
+    def get_content(self, smart_list, value_renderer):  # type: (SmartList, Callable[[Any], str]) -> Iterator[bytes]
+        lines = (line.encode(self.encoding) for line in self.get_lines(smart_list, value_renderer))
+        if not self.compress:
+            for line in lines:
+                yield line
+            return
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for line in lines:
+            chunk = compressor.compress(line)
+            if chunk:
+                yield chunk
+        yield compressor.flush()
+
+
+class SmartListCSVExportBackend(SmartListTextExportBackend):
+
+    text_content_type = 'text/csv'
+
+    def __init__(
+        self, verbose_name, file_name, extra_filters=None, limit=None, compress=False, dialect='excel', chunk_size=None
+    ):
+        super(SmartListCSVExportBackend, self).__init__(
+            verbose_name, file_name, extra_filters=extra_filters, limit=limit, compress=compress, chunk_size=chunk_size
+        )
+        self.dialect = dialect
+
+    def get_row_renderer(self, smart_list, value_renderer):
+        writer = csv.writer(_Echo(), dialect=self.dialect)
+        return lambda item: writer.writerow([value_renderer(field.get_value()) for field in item.fields()])
+
+    def get_lines(self, smart_list, value_renderer):  # type: (SmartList, Callable[[Any], str]) -> Iterator[str]
+        writer = csv.writer(_Echo(), dialect=self.dialect)
+        yield writer.writerow([value_renderer(column.get_title()) for column in smart_list.get_columns()])
+        for line in self.get_rows(smart_list, value_renderer):
+            yield line
+
+
+class SmartListJSONLinesExportBackend(SmartListTextExportBackend):
+    """Export every row as a JSON object, keyed by column titles, on its own line (NDJSON)."""
+
+    text_content_type = 'application/x-ndjson'
+
+    def get_row_renderer(self, smart_list, value_renderer):
+        titles = [value_renderer(column.get_title()) for column in smart_list.get_columns()]
+        encoder = DjangoJSONEncoder()
+
+        def render(item):
+            values = [value_renderer(field.get_value()) for field in item.fields()]
+            return encoder.encode(dict(zip(titles, values))) + '\n'
+
+        return render
+
+    def get_lines(self, smart_list, value_renderer):  # type: (SmartList, Callable[[Any], str]) -> Iterator[str]
+        return self.get_rows(smart_list, value_renderer)
+
+
+def render_export_slice(spec, backend, lower, upper):
+    # type: (Dict[str, Any], SmartListExportBackend, Optional[list], Optional[list]) -> List[Any]
+    """
+    Render the rows following the ordering values `lower` up to those of `upper` (inclusive), in a process
+    of the pool used by `SmartListExportBackend.get_rows_in_parallel`.
+    """
+    if multiprocessing.parent_process() is not None and not apps.ready:
+        django.setup()
+    try:
+        view = build_export_view(spec)
+        smart_list = view.get_export_smart_list()
+        paginator = KeysetPaginator(backend.get_queryset(smart_list), backend.parallel_slice_size)
+        query_set = paginator.object_list
+        if lower is not None:
+            query_set = query_set.filter(paginator.get_filter(lower))
+        if upper is not None:
+            query_set = query_set.filter(~paginator.get_filter(upper))
+        render = backend.get_row_renderer(smart_list, view.get_export_value_renderer())
+        return [render(SmartListItem(smart_list, obj)) for obj in backend.iterate(query_set)]
+    finally:
+        if multiprocessing.parent_process() is not None:
+            connections.close_all()
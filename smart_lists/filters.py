@@ -1,6 +1,8 @@
 class SmartListFilter(object):
     title = None
     parameter_name = None
+    # models the lookups are made from, set it to allow caching them (an empty tuple if they never change)
+    lookups_cache_models = None
 
     def __init__(self, request):
         self.request = request
@@ -1,20 +1,35 @@
 import datetime
-
-from django.core.exceptions import FieldDoesNotExist
-from django.db.models import BooleanField, ForeignKey
+import hashlib
+import inspect
+import operator
+import re
+import uuid
+from functools import partial, partialmethod
+from types import FunctionType
+
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.db.models import BooleanField, Exists, F, ForeignKey, OuterRef
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import OrderBy
+from django.db.models.query import ModelIterable
+from django.template.base import render_value_in_context
+from django.utils.encoding import force_str
 from django.utils.formats import localize
-from django.utils.html import format_html
+from django.utils.html import conditional_escape, format_html
 from django.utils.http import urlencode
-from django.utils.safestring import SafeText
+from django.utils.safestring import SafeText, mark_safe
 from django.utils.translation import gettext_lazy as _
 from typing import List
 from typing import TYPE_CHECKING
 
+from smart_lists.cache import CACHE_ALIAS, get_models_version
 from smart_lists.exceptions import SmartListException
 from smart_lists.filters import SmartListFilter
 
 if TYPE_CHECKING:
-    from typing import Union, Tuple, Text, Callable, Optional
+    from typing import Union, Tuple, Text, Callable, Optional, Iterable, Dict, Any
+    from django.db.models import Field, QuerySet
 
 
 class TitleFromModelFieldMixin(object):
@@ -50,32 +65,53 @@ class QueryParamsMixin(object):
         return '?{}'.format(urlencode(query))
 
 
+class QueryStringTemplate(object):
+    """
+    URLs of the current query parameters with one of them set to different values, e.g. the sort links of all columns.
+    The other parameters are encoded once, the URLs are the same as `QueryParamsMixin.get_url_with_query_params` makes.
+    """
+
+    def __init__(self, query_params, name, without=()):  # type: (Any, Text, Iterable[Text]) -> None
+        self.name = name
+        parameters = []
+        position = None  # the parameter keeps its place, otherwise it goes last
+        for key, value in dict(query_params).items():
+            if key == name:
+                position = len(parameters)
+                continue
+            if type(value) == list:
+                value = value[0]
+            if key not in without and value is not None:
+                parameters.append((key, value))
+        if position is None:
+            position = len(parameters)
+        self.prefix = urlencode(parameters[:position])
+        self.suffix = urlencode(parameters[position:])
+
+    def get_url(self, value):  # type: (Any) -> Text
+        """Return the URL with the parameter set to the value, or without the parameter if the value is None."""
+        parameter = urlencode({self.name: value}) if value is not None else ''
+        return '?' + '&'.join(part for part in (self.prefix, parameter, self.suffix) if part)
+
+
+_NOT_SET = object()
+
+
 class SmartListField(object):
+    __slots__ = ('smart_list_item', 'column', 'object', '_value', '_absolute_url')
+
     def __init__(self, smart_list_item, column, object):
         self.smart_list_item = smart_list_item
         self.column = column
         self.object = object
+        # the template asks for the value and the link several times, compute them once
+        self._value = _NOT_SET
+        self._absolute_url = _NOT_SET
 
     def get_value(self):
-        if self.column.render_function:
-            value = self.column.render_function(self.object)
-            if not isinstance(value, SafeText):
-                raise SmartListException(
-                    'You need to provide instance of django.utils.safestring.SafeText not {}. Ensure that all user input was sanitized.'.format(
-                        type(value)
-                    )
-                )
-        elif isinstance(self.object, dict):
-            value = self.object.get(self.column.field_name)
-        else:
-            field = getattr(self.object, self.column.field_name) if self.column.field_name else None
-            if callable(field):
-                value = field if getattr(field, 'do_not_call_in_templates', False) else field()
-            else:
-                display_function = getattr(self.object, 'get_%s_display' % self.column.field_name, False)
-                value = display_function() if display_function else field
-
-        return value
+        if self._value is _NOT_SET:
+            self._value = self.column.accessor(self.object)
+        return self._value
 
     def format(self, value):
         if isinstance(value, datetime.datetime) or isinstance(value, datetime.date):
@@ -92,39 +128,76 @@ class SmartListField(object):
             )
         return format_html('<td><a href="{}">{}</a></td>', self.get_absolute_url(), self.format(self.get_value()))
 
+    def get_link_object(self):
+        if self.column.column_id == 1:
+            return self.object
+        return self.get_value()
+
     def has_link(self):
         if self.object is None:
             return False
-        if self.column.column_id == 1:
-            obj = self.object
-        else:
-            obj = self.get_value()
-        return hasattr(obj, 'get_absolute_url')
+        return hasattr(self.get_link_object(), 'get_absolute_url')
 
     def get_absolute_url(self):
-        if self.column.column_id == 1:
-            return self.object.get_absolute_url()
-        return self.get_value().get_absolute_url()
+        if self._absolute_url is _NOT_SET:
+            self._absolute_url = self.get_link_object().get_absolute_url()
+        return self._absolute_url
 
 
 class SmartListItem(object):
+    __slots__ = ('smart_list', 'object', '_fields')
+
     def __init__(self, smart_list, object):
         self.smart_list = smart_list
         self.object = object
+        self._fields = None
 
     def fields(self):
-        return [SmartListField(self, column, self.object) for column in self.smart_list.columns]
+        if self._fields is None:
+            self._fields = [SmartListField(self, column, self.object) for column in self.smart_list.columns]
+        return self._fields
+
+
+class SmartOrdering(object):
+    """The ordering of a list, parsed from the query parameters once for all of its columns."""
+
+    def __init__(self, query_params, ordering_query_param):
+        self.query_params = query_params
+        self.ordering_query_param = ordering_query_param
+        self.query_order = query_params.get(ordering_query_param)
+        self._terms = None  # type: Optional[List[Tuple[int, bool, Text]]]
+        self._url_template = None  # type: Optional[QueryStringTemplate]
+
+    @property
+    def terms(self):  # type: () -> List[Tuple[int, bool, Text]]
+        """Column id, whether it is reversed and the term itself for every term of the ordering."""
+        if self._terms is None:
+            self._terms = [
+                (int(term.replace("-", "")), term.startswith("-"), term)
+                for term in (self.query_order.split(".") if self.query_order else [])
+            ]
+        return self._terms
+
+    @property
+    def columns(self):  # type: () -> List[int]
+        return [column_id for column_id, reverse, term in self.terms]
+
+    def get_url(self, query_order):  # type: (Any) -> Text
+        if self._url_template is None:
+            self._url_template = QueryStringTemplate(self.query_params, self.ordering_query_param)
+        return self._url_template.get_url(query_order)
 
 
 class SmartOrder(QueryParamsMixin, object):
-    def __init__(self, query_params, column_id, ordering_query_param):
+    def __init__(self, query_params, column_id, ordering_query_param, ordering=None):
+        if ordering is None:
+            ordering = SmartOrdering(query_params, ordering_query_param)
+        self.ordering = ordering
         self.query_params = query_params
         self.column_id = column_id
         self.ordering_query_param = ordering_query_param
-        self.query_order = query_params.get(ordering_query_param)
-        self.current_columns = (
-            [int(col) for col in self.query_order.replace("-", "").split(".")] if self.query_order else []
-        )
+        self.query_order = ordering.query_order
+        self.current_columns = ordering.columns
         self.current_columns_length = len(self.current_columns)
 
     @property
@@ -136,71 +209,61 @@ class SmartOrder(QueryParamsMixin, object):
         return self.column_id in self.current_columns
 
     def is_reverse(self):
-        for column in self.query_order.split('.'):
-            c = column.replace("-", "")
-            if int(c) == self.column_id:
-                if column.startswith("-"):
-                    return True
-        return False
+        return any(reverse for column_id, reverse, term in self.ordering.terms if column_id == self.column_id)
+
+    def get_other_terms(self):  # type: () -> List[Text]
+        return [term for column_id, reverse, term in self.ordering.terms if column_id != self.column_id]
 
     def get_add_sort_by(self):
         if not self.is_ordered():
             if self.query_order:
-                return self.get_url_with_query_params(
-                    {self.ordering_query_param: '{}.{}'.format(self.column_id, self.query_order)}
-                )
+                return self.ordering.get_url('{}.{}'.format(self.column_id, self.query_order))
             else:
-                return self.get_url_with_query_params({self.ordering_query_param: self.column_id})
+                return self.ordering.get_url(self.column_id)
         elif self.current_columns_length > 1:
-            new_query = []
-            for column in self.query_order.split('.'):
-                c = column.replace("-", "")
-                if not int(c) == self.column_id:
-                    new_query.append(column)
+            new_query = ".".join(self.get_other_terms())
             if not self.is_reverse() and self.current_columns[0] == self.column_id:
-                return self.get_url_with_query_params(
-                    {self.ordering_query_param: '-{}.{}'.format(self.column_id, ".".join(new_query))}
-                )
+                return self.ordering.get_url('-{}.{}'.format(self.column_id, new_query))
             else:
-                return self.get_url_with_query_params(
-                    {self.ordering_query_param: '{}.{}'.format(self.column_id, ".".join(new_query))}
-                )
+                return self.ordering.get_url('{}.{}'.format(self.column_id, new_query))
 
         else:
             return self.get_reverse_sort_by()
 
     def get_remove_sort_by(self):
-        new_query = []
-        for column in self.query_order.split('.'):
-            c = column.replace("-", "")
-            if not int(c) == self.column_id:
-                new_query.append(column)
-        return self.get_url_with_query_params({self.ordering_query_param: ".".join(new_query)})
+        return self.ordering.get_url(".".join(self.get_other_terms()))
 
     def get_reverse_sort_by(self):
         new_query = []
-        for column in self.query_order.split('.'):
-            c = column.replace("-", "")
-            if int(c) == self.column_id:
-                if column.startswith("-"):
-                    new_query.append(c)
-                else:
-                    new_query.append('-{}'.format(c))
+        for column_id, reverse, term in self.ordering.terms:
+            if column_id == self.column_id:
+                c = term.replace("-", "")
+                new_query.append(c if reverse else '-{}'.format(c))
             else:
-                new_query.append(column)
+                new_query.append(term)
 
-        return self.get_url_with_query_params({self.ordering_query_param: ".".join(new_query)})
+        return self.ordering.get_url(".".join(new_query))
 
 
-class SmartColumn(TitleFromModelFieldMixin, object):
-    def __init__(self, model, field, column_id, query_params, ordering_query_param, label=None, render_function=None):
+class SmartColumnSpec(object):
+    """
+    Request independent metadata of a list_display column.
+    It only depends on the model and list_display so it is resolved once per view, see `get_column_specs`.
+    """
+
+    def __init__(self, model, field, column_id, label=None, render_function=None):
         self.model = model
         self.field_name = field
         self.label = label
         self.render_function = render_function
+        self.model_field = None
         self.order_field = None
-        self.order = None
         self.column_id = column_id
+        self._accessors = {}  # type: Dict[bool, Callable[[Any], Any]]
+
+        # render functions can sort on a field, an annotation or an expression like methods of the model
+        if callable(self.render_function) and getattr(self.render_function, 'admin_order_field', None) is not None:
+            self.order_field = self.render_function.admin_order_field
 
         # If there is no field_name that means it is not bound to any model field
         if not self.field_name:
@@ -212,7 +275,6 @@ class SmartColumn(TitleFromModelFieldMixin, object):
             self.model_field = self.model._meta.get_field(self.field_name)
             self.order_field = self.field_name
         except FieldDoesNotExist:
-            self.model_field = None
             try:
                 field = getattr(self.model, self.field_name)
                 if callable(field) and getattr(field, 'admin_order_field', False):
@@ -223,24 +285,147 @@ class SmartColumn(TitleFromModelFieldMixin, object):
                 self.order_field = self.field_name
                 pass  # This is most likely a .values() query set
 
+    def get_order_by(self, nulls_last=False):  # type: (bool) -> Optional[Tuple[Any, Any]]
+        """
+        Return what the list is ordered by for this column ascending and descending, None if it can't be sorted.
+        The order field is a field name or an annotation (descending with a `-` prefix), or an expression, e.g.
+        `Lower('title')` or `F('date').desc(nulls_last=True)`. Names stay names unless `nulls_last` is set,
+        which applies to expressions that don't say where nulls go either.
+        """
+        order_field = self.order_field
+        if order_field is None or order_field == '':
+            return None
+        if isinstance(order_field, str):
+            name = order_field.lstrip('-')
+            descending = order_field.startswith('-')
+            if nulls_last:
+                order_by = (F(name).asc(nulls_last=True), F(name).desc(nulls_last=True))
+            else:
+                order_by = (name, '-{}'.format(name))
+            return order_by[::-1] if descending else order_by
+        if isinstance(order_field, OrderBy):
+            reverse = OrderBy(
+                order_field.expression,
+                descending=not order_field.descending,
+                nulls_first=order_field.nulls_first,
+                nulls_last=order_field.nulls_last,
+            )
+            return order_field, reverse
+        if not hasattr(order_field, 'asc'):
+            raise SmartListException("Column {} can't be ordered by {!r}".format(self.column_id, order_field))
+        nulls = {'nulls_last': True} if nulls_last else {}
+        return order_field.asc(**nulls), order_field.desc(**nulls)
+
+    def get_accessor(self, for_dicts=False):  # type: (bool) -> Callable[[Any], Any]
+        """Return a function which returns the value of this column for a row (a dict in case of `for_dicts`)."""
+        accessor = self._accessors.get(for_dicts)
+        if accessor is None:
+            accessor = self._accessors[for_dicts] = self.compile_accessor(for_dicts)
+        return accessor
+
+    def compile_accessor(self, for_dicts):  # type: (bool) -> Callable[[Any], Any]
+        """
+        Pick the cheapest way to get the value, so that nothing has to be checked for every cell:
+         - render_function result, which must be SafeText
+         - key of a dict
+         - label of a choice, get_<field>_display or field value of a model field
+         - result of a method
+         - otherwise the value is resolved dynamically, as it depends on the object (e.g. properties, annotations)
+        """
+        field_name = self.field_name
+        if self.render_function:
+            return _safe_text_accessor(self.render_function)
+        if for_dicts:
+            return operator.methodcaller('get', field_name)
+        if not field_name:
+            return lambda obj: None
+
+        display_name = 'get_%s_display' % field_name
+        if self.model_field is not None and self.model_field.concrete:
+            display_function = inspect.getattr_static(self.model, display_name, None)
+            if self.model_field.flatchoices and isinstance(display_function, partialmethod):
+                # the display function was generated by Django and not overridden, look the label up directly
+                return _choices_accessor(self.model_field, display_name)
+            if display_function is not None:
+                return operator.methodcaller(display_name)
+            return operator.attrgetter(field_name)
+
+        attribute = inspect.getattr_static(self.model, field_name, None)
+        if isinstance(attribute, (FunctionType, staticmethod, classmethod)):
+            if getattr(getattr(self.model, field_name), 'do_not_call_in_templates', False):
+                return operator.attrgetter(field_name)
+            return operator.methodcaller(field_name)
+        return partial(_get_attribute_value, field_name=field_name)
+
+
+class SmartColumn(TitleFromModelFieldMixin, object):
+    def __init__(
+        self,
+        model,
+        field,
+        column_id,
+        query_params,
+        ordering_query_param,
+        label=None,
+        render_function=None,
+        spec=None,
+        for_dicts=False,
+        ordering=None,
+    ):
+        if spec is None:
+            spec = SmartColumnSpec(model, field, column_id, label=label, render_function=render_function)
+        self.spec = spec
+        self.model = spec.model
+        self.field_name = spec.field_name
+        self.label = spec.label
+        self.render_function = spec.render_function
+        self.model_field = spec.model_field
+        self.order_field = spec.order_field
+        self.column_id = spec.column_id
+        self.accessor = spec.get_accessor(for_dicts)
+        self.order = None
+
         if self.order_field:
             self.order = SmartOrder(
-                query_params=query_params, column_id=column_id, ordering_query_param=ordering_query_param
+                query_params=query_params,
+                column_id=self.column_id,
+                ordering_query_param=ordering_query_param,
+                ordering=ordering,
             )
 
+    def prepare(self, objects):  # type: (List[Any]) -> None
+        """Compute the values of all the given rows at once if the render function supports it."""
+        render_bulk = getattr(self.render_function, 'render_bulk', None)
+        if render_bulk is None:
+            return
+        values = dict(zip((id(obj) for obj in objects), (_check_safe_text(value) for value in render_bulk(objects))))
+        accessor = self.spec.get_accessor()
+
+        def bulk_accessor(obj):
+            value = values.get(id(obj))
+            return accessor(obj) if value is None else value
+
+        self.accessor = bulk_accessor
+
 
 class SmartFilterValue(QueryParamsMixin, object):
-    def __init__(self, field_name, label, value, query_params):
+    def __init__(self, field_name, label, value, query_params, count=None, url_template=None):
         self.field_name = field_name
         self.label = label
         self.value = value
         self.query_params = query_params
+        # number of objects listed after choosing this value, when the view computes filter counts
+        self.count = count
+        # shared by the values of a filter, see SmartFilter.get_url_template
+        self.url_template = url_template  # type: Optional[QueryStringTemplate]
 
     def get_title(self):
         return self.label
 
     def get_url(self):
         # we are clearing pagination (`page` param) when setting new filter
+        if self.url_template is not None:
+            return self.url_template.get_url(self.value)
         return self.get_url_with_query_params({self.field_name: self.value}, without=['page'])
 
     def is_active(self):
@@ -256,8 +441,14 @@ class SmartFilterValue(QueryParamsMixin, object):
 
 
 class SmartFilter(TitleFromModelFieldMixin, object):
+    # defaults of `list_filter_max_values` and `list_filter_label_fields` of the view
+    max_values = 200
+    label_fields = {}  # type: Dict[Text, Text]
+
     def __init__(self, model, field, query_params, object_list, view):
         self.model = model
+        # set when a ForeignKey filter has more than `max_values` values, which are not listed then
+        self.too_many_values = False
 
         if isinstance(field, SmartListFilter):
             self.field_name = field.parameter_name
@@ -268,37 +459,113 @@ class SmartFilter(TitleFromModelFieldMixin, object):
         self.query_params = query_params
         self.object_list = object_list
         self.view = view
+        self._values = None  # type: Optional[List[SmartFilterValue]]
+        self._url_template = None  # type: Optional[QueryStringTemplate]
 
     def get_title(self):
         if isinstance(self.model_field, SmartListFilter):
             return self.model_field.title
         return super(SmartFilter, self).get_title()
 
-    def get_values(self):
+    def get_values(self):  # type: () -> List[SmartFilterValue]
+        if self._values is None:
+            self._values = self.compute_values()
+        return self._values
+
+    def get_url_template(self):  # type: () -> QueryStringTemplate
+        """Return the URLs of the values, the other query parameters are encoded once for all of them."""
+        if self._url_template is None:
+            self._url_template = QueryStringTemplate(self.query_params, self.field_name, without=['page'])
+        return self._url_template
+
+    def make_value(self, label, value):  # type: (Any, Any) -> SmartFilterValue
+        return SmartFilterValue(self.field_name, label, value, self.query_params, url_template=self.get_url_template())
+
+    def compute_values(self):  # type: () -> List[SmartFilterValue]
         values = []
         if isinstance(self.model_field, SmartListFilter):
-            values = [
-                SmartFilterValue(self.model_field.parameter_name, choice[1], choice[0], self.query_params)
-                for choice in self.model_field.lookups()
-            ]
+            values = [self.make_value(choice[1], choice[0]) for choice in self.get_lookups()]
         elif self.model_field.choices:
-            values = [
-                SmartFilterValue(self.field_name, choice[1], choice[0], self.query_params)
-                for choice in self.model_field.choices
-            ]
+            values = [self.make_value(choice[1], choice[0]) for choice in self.model_field.choices]
         elif type(self.model_field) == BooleanField:
-            values = [
-                SmartFilterValue(self.field_name, choice[1], choice[0], self.query_params)
-                for choice in ((1, _('Yes')), (0, _('No')))
-            ]
+            values = [self.make_value(choice[1], choice[0]) for choice in ((1, _('Yes')), (0, _('No')))]
         elif issubclass(type(self.model_field), ForeignKey):
-            # use `self.view.object_list` in order to create filter from all objects not a paginated subset
-            pks = self.view.object_list.order_by().distinct().values_list('%s__pk' % self.field_name, flat=True)
-            remote_field = self.model_field.rel if hasattr(self.model_field, 'rel') else self.model_field.remote_field
-            qs = remote_field.model.objects.filter(pk__in=pks)
-            values = [SmartFilterValue(self.field_name, obj, str(obj.pk), self.query_params) for obj in qs]
+            values = self.get_foreign_key_values()
+
+        values = [self.make_value(_("All"), None)] + values
+        if getattr(self.view, 'list_filter_counts', False) and not isinstance(self.model_field, SmartListFilter):
+            counts = self.view.get_filter_counts().get(self.field_name, {})
+            for value in values:
+                value.count = counts.get(None if value.value is None else str(value.value), 0)
+        return values
+
+    def get_cache_timeout(self):
+        """Return the timeout for caching the values, or False when they must not be cached."""
+        if not getattr(self.view, 'list_filter_cache', False):
+            return False
+        return getattr(self.view, 'list_filter_cache_timeout', None)
+
+    def get_cache_key_prefix(self):  # type: () -> Text
+        view_class = type(self.view)
+        return 'filter_values.{}.{}.{}'.format(view_class.__module__, view_class.__name__, self.field_name)
 
-        return [SmartFilterValue(self.field_name, _("All"), None, self.query_params)] + values
+    def get_lookups(self):
+        """
+        Return lookups of the SmartListFilter. They are cached if the view enables `list_filter_cache` and
+        the filter lists models its lookups depend on in `lookups_cache_models`.
+        """
+        cache_models = getattr(self.model_field, 'lookups_cache_models', None)
+        timeout = self.get_cache_timeout()
+        if cache_models is None or timeout is False:
+            return self.model_field.lookups()
+
+        cache = caches[CACHE_ALIAS]
+        cache_key = 'smart_lists.{}.{}'.format(self.get_cache_key_prefix(), get_models_version(*cache_models))
+        lookups = cache.get(cache_key)
+        if lookups is None:
+            lookups = list(self.model_field.lookups())
+            cache.set(cache_key, lookups, timeout)
+        return lookups
+
+    def get_foreign_key_values(self):  # type: () -> List[SmartFilterValue]
+        """
+        List the related objects referenced by the listed objects, with a single query.
+        Only the primary key and the label field are fetched if the view defines a label field for the filter.
+        """
+        remote_field = self.model_field.rel if hasattr(self.model_field, 'rel') else self.model_field.remote_field
+        # use `self.view.object_list` in order to create filter from all objects not a paginated subset
+        object_list = self.view.object_list if self.view is not None else self.object_list
+        referencing = object_list.filter(**{self.field_name + '__pk': OuterRef('pk')})
+        qs = remote_field.model._default_manager.filter(Exists(referencing))
+
+        label_field = getattr(self.view, 'list_filter_label_fields', self.label_fields).get(self.field_name)
+        if label_field:
+            qs = qs.order_by(label_field).values_list('pk', label_field)
+        max_values = getattr(self.view, 'list_filter_max_values', self.max_values)
+        if max_values is not None:
+            qs = qs[: max_values + 1]
+
+        timeout = self.get_cache_timeout()
+        cache_key = None
+        if timeout is not False:
+            version = get_models_version(self.model, remote_field.model)
+            cache_key = get_queryset_cache_key(self.get_cache_key_prefix(), qs, version)
+        cached = caches[CACHE_ALIAS].get(cache_key) if cache_key else None
+        if cached is not None:
+            self.too_many_values, choices = cached
+        else:
+            rows = list(qs)
+            if max_values is not None and len(rows) > max_values:
+                self.too_many_values, choices = True, []
+            elif label_field:
+                choices = [(str(pk), label) for pk, label in rows]
+            elif cache_key:
+                choices = [(str(obj.pk), str(obj)) for obj in rows]
+            else:
+                choices = [(str(obj.pk), obj) for obj in rows]
+            if cache_key:
+                caches[CACHE_ALIAS].set(cache_key, (self.too_many_values, choices), timeout)
+        return [self.make_value(label, value) for value, label in choices]
 
 
 class SmartList(object):
@@ -315,6 +582,8 @@ class SmartList(object):
     ):
         self.object_list = object_list
         self.model = object_list.model
+        # querysets made with .values() return dicts
+        self.returns_dicts = not issubclass(getattr(object_list, '_iterable_class', ModelIterable), ModelIterable)
         self.model_name = self.model._meta.model_name
         self.query_params = query_params or {}
         self.list_display = list_display or []
@@ -324,6 +593,8 @@ class SmartList(object):
         self.search_query_param = search_query_param
         self.ordering_query_value = self.query_params.get(ordering_query_param, '')
         self.ordering_query_param = ordering_query_param
+        self.view = view
+        self.ordering = SmartOrdering(self.query_params, ordering_query_param)
 
         self.columns = self.get_columns()
 
@@ -348,24 +619,68 @@ class SmartList(object):
             - label for the column (string)
         """
 
-        if not self.list_display:
-            return [SmartColumn(self.model, '__str__', 1, self.ordering_query_value, self.ordering_query_param)]
-
-        columns = []
-        for index, field in enumerate(self.list_display, start=1):
-            kwargs = {
-                'model': self.model,
-                'column_id': index,
-                'query_params': self.query_params,
-                'ordering_query_param': self.ordering_query_param,
-            }
-            kwargs['field'], kwargs['render_function'], kwargs['label'] = normalize_list_display_item(field)
-            columns.append(SmartColumn(**kwargs))
-        return columns
+        return [
+            SmartColumn(
+                self.model,
+                spec.field_name,
+                spec.column_id,
+                self.query_params,
+                self.ordering_query_param,
+                spec=spec,
+                for_dicts=self.returns_dicts,
+                ordering=self.ordering,
+            )
+            for spec in get_column_specs(
+                self.model, self.list_display or ['__str__'], type(self.view) if self.view is not None else None
+            )
+        ]
 
     @property
     def items(self):
-        return [SmartListItem(self, obj) for obj in self.object_list]
+        items = [SmartListItem(self, obj) for obj in self.object_list]
+        objects = [item.object for item in items]
+        for column in self.columns:
+            column.prepare(objects)
+        return items
+
+    def render_rows(self, context, table_link_class=''):  # type: (Any, Text) -> SafeText
+        """
+        Render the rows of the table body like `smart_lists/smart_list.html` does, byte for byte, without resolving
+        template variables for every cell. Values are rendered in the given template context (localization,
+        time zone) and always escaped unless they are SafeText, links are built with `format_html`.
+        """
+        items = self.items  # prepares the columns, which may swap their accessors for bulk rendered values
+        last_column = len(self.columns) - 1
+        cells = [
+            (column.accessor, column.column_id == 1, _CELL_START.format('text-right' if index == last_column else ''))
+            for index, column in enumerate(self.columns)
+        ]
+        link_class = render_value_in_context(table_link_class, context)
+        parts = []
+        for item in items:
+            obj = item.object
+            parts.append(_ROW_START)
+            for accessor, links_object, cell_start in cells:
+                value = accessor(obj)
+                link_object = obj if links_object else value
+                parts.append(cell_start)
+                if obj is not None and hasattr(link_object, 'get_absolute_url'):
+                    url = render_value_in_context(link_object.get_absolute_url(), context)
+                    parts.append(format_html(_LINK, url, link_class, render_value_in_context(value, context)))
+                else:
+                    parts.append(_VALUE.format(conditional_escape(render_value_in_context(value, context))))
+                parts.append(_CELL_END)
+            parts.append(_ROW_END)
+        return mark_safe(''.join(parts))
+
+
+# the markup of a row of `smart_lists/smart_list.html`, whitespace included
+_ROW_START = '\n                <tr>\n                    '
+_ROW_END = '\n                </tr>\n              '
+_CELL_START = '\n                    <td class="{}">\n                        '
+_CELL_END = '\n                    </td>\n                    '
+_LINK = '\n                            <a href="{}" class="{}">{}</a>\n                        '
+_VALUE = '\n                            {}\n                        '
 
 
 def normalize_list_display_item(
@@ -392,10 +707,243 @@ def normalize_list_display_item(
     return field_name, render_function, label
 
 
-def render_column_template(template_name):
+def get_queryset_cache_key(prefix, queryset, *extra):  # type: (Text, QuerySet, Any) -> Optional[Text]
+    """Return a cache key identifying the SQL of the queryset, None for querysets which can't match anything."""
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return None
+    signature = '{}:{}:{!r}:{!r}'.format(queryset.db, sql, params, extra)
+    return 'smart_lists.{}.{}'.format(prefix, hashlib.md5(signature.encode()).hexdigest())
+
+
+# the columns of the latest list_display per view class and model
+_column_specs_cache = {}  # type: Dict[Tuple[Optional[type], type], Tuple[Tuple, Tuple[SmartColumnSpec, ...]]]
+
+
+def get_column_specs(model, list_display, view_class=None):
+    # type: (type, Iterable, Optional[type]) -> Tuple[SmartColumnSpec, ...]
+    """
+    Return the resolved columns of list_display. Only the columns of the latest list_display of a view class are
+    cached, so views which build list_display with new callables for every request don't fill the cache.
+    """
+    list_display = tuple(list_display)
+    key = (view_class, model)
+    cached = _column_specs_cache.get(key)
+    if cached is not None and cached[0] == list_display:
+        return cached[1]
+    specs = tuple(
+        SmartColumnSpec(model, field_name, index, label=label, render_function=render_function)
+        for index, (field_name, render_function, label) in enumerate(
+            (normalize_list_display_item(field) for field in list_display), start=1
+        )
+    )
+    _column_specs_cache[key] = (list_display, specs)
+    return specs
+
+
+# the ordering table of the latest list_display per view class, model and nulls_last
+_ordering_tables_cache = {}  # type: Dict[Tuple[Optional[type], type, bool], Tuple[Tuple, Dict[int, Tuple[Any, Any]]]]
+
+
+def get_ordering_table(model, list_display, nulls_last=False, view_class=None):
+    # type: (type, Iterable, bool, Optional[type]) -> Dict[int, Tuple[Any, Any]]
+    """Return the ascending and descending ordering of the sortable columns by column id, cached like the specs."""
+    list_display = tuple(list_display)
+    key = (view_class, model, nulls_last)
+    cached = _ordering_tables_cache.get(key)
+    if cached is not None and cached[0] == list_display:
+        return cached[1]
+    table = {}
+    for spec in get_column_specs(model, list_display, view_class):
+        order_by = spec.get_order_by(nulls_last=nulls_last)
+        if order_by is not None:
+            table[spec.column_id] = order_by
+    _ordering_tables_cache[key] = (list_display, table)
+    return table
+
+
+_column_id_re = re.compile(r'^[0-9]+$')
+
+
+def resolve_ordering(model, list_display, query_order, max_terms=None, nulls_last=False, view_class=None):
+    # type: (type, Iterable, Text, Optional[int], bool, Optional[type]) -> List[Any]
+    """
+    Translate the value of the ordering query parameter, column ids separated by dots and prefixed with `-` for
+    descending order (e.g. `-2.1`), into arguments of `order_by`. There are at most `max_terms` terms (the number
+    of columns by default) and repeated columns are ignored. Raises SmartListException for illegal values.
+    """
+    list_display = list(list_display)
+    table = get_ordering_table(model, list_display, nulls_last=nulls_last, view_class=view_class)
+    if max_terms is None:
+        max_terms = max(len(list_display), 1)
+    terms = query_order.split('.', max_terms)  # never splits more than needed to tell it's too long
+    if len(terms) > max_terms:
+        raise SmartListException("Illegal ordering")
+    ordering = []
+    seen = set()
+    for term in terms:
+        descending = term.startswith('-')
+        column = term[1:] if descending else term
+        order_by = table.get(int(column)) if _column_id_re.match(column) else None
+        if order_by is None:
+            raise SmartListException("Illegal ordering")
+        if column in seen:
+            continue
+        seen.add(column)
+        ordering.append(order_by[descending])
+    return ordering
+
+
+def clear_column_specs_cache():  # type: () -> None
+    """Forget the cached column specs and ordering tables, e.g. after changing `list_display` of a view in tests."""
+    _column_specs_cache.clear()
+    _ordering_tables_cache.clear()
+
+
+def _check_safe_text(value):  # type: (Any) -> SafeText
+    if not isinstance(value, SafeText):
+        raise SmartListException(
+            'You need to provide instance of django.utils.safestring.SafeText not {}. Ensure that all user input was sanitized.'.format(
+                type(value)
+            )
+        )
+    return value
+
+
+def _safe_text_accessor(render_function):  # type: (Callable[[Any], SafeText]) -> Callable[[Any], SafeText]
+    def accessor(obj):
+        return _check_safe_text(render_function(obj))
+
+    return accessor
+
+
+def _choices_accessor(model_field, display_name):  # type: (Field, Text) -> Callable[[Any], Any]
+    choices = dict(model_field.flatchoices)
+    attname = model_field.attname
+
+    def accessor(obj):
+        value = getattr(obj, attname)
+        try:
+            return force_str(choices.get(value, value), strings_only=True)
+        except TypeError:  # unhashable value
+            return getattr(obj, display_name)()
+
+    return accessor
+
+
+def _get_attribute_value(obj, field_name):  # type: (Any, Text) -> Any
+    field = getattr(obj, field_name)
+    if callable(field):
+        return field if getattr(field, 'do_not_call_in_templates', False) else field()
+    display_function = getattr(obj, 'get_%s_display' % field_name, False)
+    return display_function() if display_function else field
+
+
+def get_related_lookups(model, lookups):  # type: (type, Iterable[Text]) -> Tuple[List[Text], List[Text]]
+    """
+    Find the relations which are followed by the given lookups (e.g. `foreign_1` or `foreign_1__title`).
+    Return them split into the ones which can be joined with select_related (forward ForeignKeys and
+    OneToOneFields) and the ones which need prefetch_related (reverse ForeignKeys and ManyToManyFields).
+    """
+    select_related, prefetch_related = [], []
+    for lookup in lookups:
+        opts = model._meta
+        path = []
+        prefetch = False
+        for part in lookup.split(LOOKUP_SEP):
+            try:
+                field = opts.get_field(part)
+            except FieldDoesNotExist:
+                break
+            if not field.is_relation:
+                break
+            path.append(part)
+            if field.many_to_many or field.one_to_many or field.related_model is None:
+                # related_model is None for generic foreign keys, which can only be prefetched
+                prefetch = True
+            if field.related_model is None:
+                break
+            opts = field.related_model._meta
+        if path:
+            related_lookup = LOOKUP_SEP.join(path)
+            target = prefetch_related if prefetch else select_related
+            if related_lookup not in target:
+                target.append(related_lookup)
+    return select_related, prefetch_related
+
+
+def is_deferred_lookup(query, lookup):  # type: (Any, Text) -> bool
+    """
+    Tell whether a relation followed by the lookup is not loaded by the query because of `defer()` or `only()`,
+    in which case it can't be joined with select_related.
+    """
+    names, defer = query.deferred_loading
+    parts = lookup.split(LOOKUP_SEP)
+    for depth in range(1, len(parts) + 1):
+        path = LOOKUP_SEP.join(parts[:depth])
+        if defer:
+            if path in names:
+                return True
+            continue
+        # `only()` restricts the fields of a model when it names any of them
+        parent = LOOKUP_SEP.join(parts[: depth - 1])
+        loaded = [name for name in names if depth == 1 or name.startswith(parent + LOOKUP_SEP)]
+        if loaded and not any(name == path or name.startswith(path + LOOKUP_SEP) for name in loaded):
+            return True
+    return False
+
+
+def render_column_template(template_name, bulk=False):
+    """
+    Return a column render function rendering the template with `obj` in the context.
+    The template is loaded once, at first use.
+
+    With `bulk` the column of a whole page is rendered in a single template pass, instead of once per row.
+    """
     from django.template.loader import get_template
 
+    templates = []
+
+    def get_column_template():
+        if not templates:
+            templates.append(get_template(template_name))
+        return templates[0]
+
     def func(obj):
-        return get_template(template_name).render({'obj': obj})
+        return get_column_template().render({'obj': obj})
 
+    if bulk:
+        func.render_bulk = _bulk_template_renderer(get_column_template)
     return func
+
+
+def _bulk_template_renderer(get_column_template):  # type: (Callable) -> Callable[[List[Any]], List[SafeText]]
+    from django.template import Template
+    from django.template.context import make_context
+
+    separator = mark_safe('<!--{}-->'.format(uuid.uuid4().hex))
+    wrappers = []
+
+    def render_bulk(objects):
+        column_template = get_column_template()
+        if not hasattr(column_template, 'template'):
+            # not a Django template, the templates can't be included one into another
+            return [column_template.render({'obj': obj}) for obj in objects]
+        if not wrappers:
+            wrappers.append(
+                Template(
+                    '{% for obj in objs %}{% include column_template %}{{ separator }}{% endfor %}',
+                    engine=column_template.template.engine,
+                )
+            )
+        # escape like the template renders a single row, with the settings of its engine
+        context = make_context(
+            {'objs': objects, 'column_template': column_template.template, 'separator': separator},
+            autoescape=column_template.template.engine.autoescape,
+        )
+        content = wrappers[0].render(context)
+        # every part was rendered (and escaped) by the template
+        return [mark_safe(part) for part in content.split(separator)[: len(objects)]]
+
+    return render_bulk
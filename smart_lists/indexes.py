@@ -0,0 +1,339 @@
+import re
+
+from typing import TYPE_CHECKING
+
+from django.core.exceptions import FieldDoesNotExist, FieldError
+from django.db import DatabaseError, connections, transaction
+from django.db.models import F
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import OrderBy
+from django.http import HttpRequest, QueryDict
+
+from smart_lists.exceptions import SmartListException
+from smart_lists.filters import SmartListFilter
+from smart_lists.helpers import get_column_specs, get_ordering_table
+from smart_lists.mixins import SmartListMixin
+from smart_lists.search import PostgresFullTextSearchEngine, SQLiteFTS5SearchEngine, TrigramSearchEngine
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, Iterator, List, Optional, Sequence, Text, Tuple
+    from django.db.models import Field, QuerySet
+
+# patterns finding a sequential scan of a table and a sort in the output of EXPLAIN, per database vendor
+PLAN_PATTERNS = {
+    'sqlite': (r'\bSCAN (TABLE )?{table}\b(?! USING)', r'USE TEMP B-TREE FOR ORDER BY'),
+    'postgresql': (r'\bSeq Scan on {table}\b', r'(^|->\s+)(Incremental )?Sort\b'),
+    'mysql': (r'\t{table}\t[^\t]*\tALL\t', r'Using filesort'),
+    'oracle': (r'TABLE ACCESS (STORAGE )?FULL\W+{table}\b', r'SORT ORDER BY'),
+}
+
+SEARCH_TERM = 'smart'
+
+
+class IndexSuggestion(object):
+    """An entry for `Meta.indexes` of a model."""
+
+    def __init__(self, model, definition, note=''):  # type: (type, Text, Text) -> None
+        self.model = model
+        self.definition = definition
+        self.note = note
+
+    def __eq__(self, other):
+        return isinstance(other, IndexSuggestion) and (self.model, self.definition) == (other.model, other.definition)
+
+    def __hash__(self):
+        return hash((self.model, self.definition))
+
+    def __str__(self):
+        return '{},{}'.format(self.definition, '  # {}'.format(self.note) if self.note else '')
+
+
+class IndexCheck(object):
+    """
+    A query a smart list view runs, checked for a sequential scan of the listed table (`kind` is 'scan')
+    or for a sort (`kind` is 'sort'), and the indexes which would support it.
+    """
+
+    def __init__(self, description, queryset, kind, suggestions=(), explain_suggestions=()):
+        # type: (Text, QuerySet, Text, Sequence[IndexSuggestion], Sequence[IndexSuggestion]) -> None
+        self.description = description
+        self.queryset = queryset
+        self.kind = kind
+        # suggested unless the model has such an index already
+        self.suggestions = [suggestion for suggestion in suggestions if suggestion is not None]
+        # suggested only if the query plan shows the problem, e.g. indexes combining a filter and the ordering
+        self.explain_suggestions = [suggestion for suggestion in explain_suggestions if suggestion is not None]
+        self.plan = None  # type: Optional[Text]
+        self.problems = []  # type: List[Text]
+
+    def explain(self, using='default'):  # type: (Text) -> List[Text]
+        """Run EXPLAIN for the query and return the problems found in the plan."""
+        connection = connections[using]
+        try:
+            with transaction.atomic(using=using):
+                self.plan = self.queryset.using(using).explain()
+        except (DatabaseError, FieldError, SmartListException) as e:
+            self.problems = ['could not explain: {}'.format(e)]
+            return self.problems
+
+        patterns = PLAN_PATTERNS.get(connection.vendor)
+        if patterns is None:
+            return self.problems
+        table = self.queryset.model._meta.db_table
+        table = re.escape(table.upper() if connection.vendor == 'oracle' else table)
+        scan, sort = patterns
+        if self.kind == 'scan' and re.search(scan.format(table=table), self.plan, re.MULTILINE):
+            self.problems.append('sequential scan')
+        if self.kind == 'sort' and re.search(sort, self.plan, re.MULTILINE):
+            self.problems.append('sort without index')
+        return self.problems
+
+    def get_suggestions(self):  # type: () -> List[IndexSuggestion]
+        suggestions = list(self.suggestions)
+        if self.problems and not self.problems[0].startswith('could not explain'):
+            suggestions.extend(self.explain_suggestions)
+        return suggestions
+
+
+def iter_smart_list_views(urlconf=None):  # type: (Optional[Text]) -> Iterator[Tuple[Text, type, Dict[Text, Any]]]
+    """Yield the route, class and init arguments of every class based view using SmartListMixin in the URLconf."""
+    from django.urls import URLPattern, URLResolver, get_resolver
+
+    def walk(patterns, prefix):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                for view in walk(pattern.url_patterns, prefix + str(pattern.pattern)):
+                    yield view
+            elif isinstance(pattern, URLPattern):
+                view_class = getattr(pattern.callback, 'view_class', None)
+                if isinstance(view_class, type) and issubclass(view_class, SmartListMixin):
+                    yield prefix + str(pattern.pattern), view_class, getattr(pattern.callback, 'view_initkwargs', {})
+
+    return walk(get_resolver(urlconf).url_patterns, '')
+
+
+def make_request(query_params=None):  # type: (Optional[Dict[Text, Any]]) -> HttpRequest
+    """Return an anonymous GET request with the given query parameters."""
+    from django.contrib.auth.models import AnonymousUser
+
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = '/'
+    request.GET = QueryDict(mutable=True)
+    for key, value in (query_params or {}).items():
+        request.GET[key] = value
+    request.GET._mutable = False
+    request.user = AnonymousUser()
+    return request
+
+
+def build_view(view_class, initkwargs):  # type: (type, Dict[Text, Any]) -> Any
+    """Set up the view for an anonymous GET request without query parameters and URL arguments."""
+    view = view_class(**initkwargs)
+    view.setup(make_request())
+    return view
+
+
+def resolve_field(model, path):  # type: (type, Text) -> Optional[Tuple[type, Field]]
+    """Follow the relations of a lookup path to the model and the concrete field it ends at."""
+    names = path.split(LOOKUP_SEP)
+    for index, name in enumerate(names):
+        try:
+            field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        except FieldDoesNotExist:  # an annotation, a lookup or a transform
+            return None
+        if index < len(names) - 1:
+            if not field.is_relation:
+                return None
+            model = field.related_model
+    if not getattr(field, 'concrete', False) or field.many_to_many:
+        return None
+    return model, field
+
+
+def get_index_name(model, field_names, suffix):  # type: (type, Sequence[Text], Text) -> Text
+    # index names are at most 30 characters long and start with a letter
+    return '{}_{}_{}'.format(
+        model._meta.model_name[:8], '_'.join(name.lstrip('-') for name in field_names)[:12], suffix
+    )
+
+
+def has_index(model, field_names):  # type: (type, Sequence[Text]) -> bool
+    """Return whether an index of the model starts with the given fields."""
+    names = [name.lstrip('-') for name in field_names]
+    if len(names) == 1:
+        try:
+            field = model._meta.get_field(names[0])
+        except FieldDoesNotExist:
+            field = None
+        if field is not None and (field.primary_key or field.unique or getattr(field, 'db_index', False)):
+            return True
+    indexed = [[name.lstrip('-') for name in index.fields] for index in model._meta.indexes]
+    indexed += [list(fields) for fields in getattr(model._meta, 'index_together', ())]  # removed in Django 5.1
+    indexed += [list(fields) for fields in model._meta.unique_together]
+    return any(fields[: len(names)] == names for fields in indexed)
+
+
+def has_gin_index(model, field_name, opclass_suffix=None):  # type: (type, Text, Optional[Text]) -> bool
+    """Return whether a GIN or GiST index covers the field, with an operator class ending with the suffix if given."""
+    for index in model._meta.indexes:
+        if type(index).__name__ not in ('GinIndex', 'GistIndex'):
+            continue
+        if field_name not in index.fields:
+            if getattr(index, 'expressions', ()) and opclass_suffix is None:
+                return True  # an expression index, e.g. on a SearchVector of the field
+            continue
+        if opclass_suffix is None or any(opclass.endswith(opclass_suffix) for opclass in index.opclasses):
+            return True
+    return False
+
+
+def suggest_index(model, path):  # type: (type, Text) -> Optional[IndexSuggestion]
+    """Suggest a B-tree index for equality lookups and sorting on the field at the end of the path."""
+    resolved = resolve_field(model, path)
+    if resolved is None:
+        return None
+    model, field = resolved
+    if has_index(model, [field.name]):
+        return None
+    return IndexSuggestion(
+        model, "models.Index(fields=['{}'], name='{}')".format(field.name, get_index_name(model, [field.name], 'idx'))
+    )
+
+
+def suggest_composite_index(model, field_names):  # type: (type, Sequence[Text]) -> Optional[IndexSuggestion]
+    """Suggest an index for filtering on the first field and sorting on the others, for local fields only."""
+    if any(LOOKUP_SEP in name or resolve_field(model, name.lstrip('-')) is None for name in field_names):
+        return None
+    if has_index(model, field_names):
+        return None
+    return IndexSuggestion(
+        model,
+        "models.Index(fields=[{}], name='{}')".format(
+            ', '.join("'{}'".format(name) for name in field_names), get_index_name(model, field_names, 'idx')
+        ),
+    )
+
+
+def suggest_search_index(model, search_field, search_engine):  # type: (type, Text, Any) -> Optional[IndexSuggestion]
+    """Suggest an index for the way the search engine matches the search field."""
+    if isinstance(search_engine, SQLiteFTS5SearchEngine) and search_field[:1] not in search_engine.prefix_lookups:
+        return None  # matched in the FTS5 table
+    prefix = search_field[:1] if search_field[:1] in search_engine.prefix_lookups else ''
+    resolved = resolve_field(model, search_field[len(prefix) :])
+    if resolved is None:
+        return None
+    model, field = resolved
+    name = field.name
+
+    if prefix == '=':
+        if has_index(model, [name]):
+            return None
+        definition = "models.Index(Upper('{}'), name='{}')".format(name, get_index_name(model, [name], 'upper'))
+        return IndexSuggestion(model, definition, 'iexact compares upper case values, Django 3.2+')
+    if prefix == '@' or (not prefix and isinstance(search_engine, PostgresFullTextSearchEngine)):
+        vector_field = getattr(search_engine, 'vector_field', None) if not prefix else None
+        if vector_field:
+            if has_gin_index(model, vector_field):
+                return None
+            definition = "GinIndex(fields=['{}'], name='{}')".format(
+                vector_field, get_index_name(model, [vector_field], 'gin')
+            )
+            return IndexSuggestion(model, definition, 'django.contrib.postgres.indexes')
+        if has_gin_index(model, name):
+            return None
+        config = getattr(search_engine, 'config', None) or 'english'
+        definition = "GinIndex(SearchVector('{}', config='{}'), name='{}')".format(
+            name, config, get_index_name(model, [name], 'fts')
+        )
+        return IndexSuggestion(
+            model, definition, 'used by PostgresFullTextSearchEngine(config={!r}), Django 3.2+'.format(config)
+        )
+    # icontains, istartswith and trigram similarity are served by trigram indexes
+    if has_gin_index(model, name, opclass_suffix='_trgm_ops'):
+        return None
+    definition = "GinIndex(fields=['{}'], opclasses=['gin_trgm_ops'], name='{}')".format(
+        name, get_index_name(model, [name], 'trgm')
+    )
+    note = 'django.contrib.postgres.indexes, requires the pg_trgm extension'
+    if not prefix and not isinstance(search_engine, TrigramSearchEngine):
+        note += ' (icontains)'
+    return IndexSuggestion(model, definition, note)
+
+
+def get_order_path(order_by):  # type: (Any) -> Optional[Text]
+    """Return the lookup path an ordering sorts on, None for expressions other than fields."""
+    if isinstance(order_by, str):
+        return order_by.lstrip('-')
+    if isinstance(order_by, OrderBy):
+        order_by = order_by.expression
+    if isinstance(order_by, F):
+        return order_by.name
+    return None
+
+
+def get_view_checks(view):  # type: (Any) -> List[IndexCheck]
+    """
+    Return the queries of the view worth checking: the list sorted by each sortable column, filtered by each filter
+    (alone and with the default ordering) and searched in the search fields.
+    """
+    queryset = view.get_queryset()
+    model = queryset.model
+    page_size = view.get_paginate_by(queryset) or 100
+    list_display = view.get_list_display()
+    checks = []
+
+    table = get_ordering_table(model, list_display, nulls_last=view.ordering_nulls_last, view_class=type(view))
+    for spec in get_column_specs(model, list_display, type(view)):
+        if spec.column_id not in table:
+            continue
+        order_by = table[spec.column_id][0]
+        path = get_order_path(order_by)
+        checks.append(
+            IndexCheck(
+                'ordering by column {} ({})'.format(spec.column_id, spec.field_name or spec.label),
+                queryset.order_by(order_by)[:page_size],
+                'sort',
+                [suggest_index(model, path) if path else None],
+            )
+        )
+
+    default_ordering = list(queryset.query.order_by or model._meta.ordering)
+    unfiltered = queryset.order_by()
+    for fltr in view.list_filter:
+        if isinstance(fltr, str):
+            values = unfiltered.exclude(**{fltr + '__isnull': True}).values_list(fltr, flat=True)[:1]
+            value = values[0] if values else None
+            filtered = queryset.filter(**{fltr: value})
+            checks.append(
+                IndexCheck('filter {}'.format(fltr), filtered.order_by(), 'scan', [suggest_index(model, fltr)])
+            )
+            order_fields = [order for order in default_ordering if order.lstrip('-') != fltr]
+            if order_fields and all(isinstance(order, str) for order in default_ordering):
+                checks.append(
+                    IndexCheck(
+                        'filter {}, ordered by {}'.format(fltr, ', '.join(order_fields)),
+                        filtered[:page_size],
+                        'sort',
+                        explain_suggestions=[suggest_composite_index(model, [fltr] + order_fields)],
+                    )
+                )
+        elif issubclass(fltr, SmartListFilter):
+            lookups = list(fltr(view.request).lookups() or [])
+            if not lookups or not fltr.parameter_name:
+                continue
+            filtered = fltr(make_request({fltr.parameter_name: lookups[0][0]})).queryset(unfiltered)
+            if filtered is not None:
+                checks.append(IndexCheck('filter {}'.format(fltr.parameter_name), filtered, 'scan'))
+
+    if view.search_fields:
+        engine = view.get_search_engine()
+        checks.append(
+            IndexCheck(
+                'search in {}'.format(', '.join(str(field) for field in view.search_fields)),
+                engine.search(unfiltered, view.search_fields, SEARCH_TERM),
+                'scan',
+                [suggest_search_index(model, str(field), engine) for field in view.search_fields],
+            )
+        )
+    return checks
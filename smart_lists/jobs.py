@@ -0,0 +1,280 @@
+import copy
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from typing import TYPE_CHECKING
+
+from django.core.cache import caches
+from django.core.files import File
+from django.db import connections
+from django.http import HttpRequest, HttpResponse, QueryDict, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from smart_lists.cache import CACHE_ALIAS
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, Iterator, List, Optional, Text, Tuple
+    from django.core.files.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+# export jobs save their file in a directory named after the job in this directory of the storage
+EXPORTS_DIRECTORY = 'smart_lists/exports'
+
+
+class ExportJob(object):
+    """
+    State of a background export, kept in the cache so that web and worker processes share it
+    (use a cache shared by all processes, e.g. Redis or memcached, with `ProcessPoolExportJobRunner`).
+    """
+
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    timeout = 24 * 60 * 60
+
+    def __init__(self, user_id, file_name, content_type, job_id=None):
+        # type: (Any, Text, Text, Optional[Text]) -> None
+        self.id = job_id or uuid.uuid4().hex
+        self.user_id = user_id
+        self.file_name = file_name
+        self.content_type = content_type
+        self.state = self.PENDING
+        self.progress = 0
+        self.total = None  # type: Optional[int]
+        self.storage_name = None  # type: Optional[Text]
+        self.error = None  # type: Optional[Text]
+
+    @staticmethod
+    def get_cache_key(job_id):  # type: (Text) -> Text
+        return 'smart_lists.export_job.{}'.format(job_id)
+
+    @classmethod
+    def get(cls, job_id):  # type: (Text) -> Optional[ExportJob]
+        return caches[CACHE_ALIAS].get(cls.get_cache_key(job_id))
+
+    def save(self):
+        caches[CACHE_ALIAS].set(self.get_cache_key(self.id), self, self.timeout)
+
+    def to_dict(self):  # type: () -> Dict[Text, Any]
+        return {
+            'id': self.id,
+            'state': self.state,
+            'progress': self.progress,
+            'total': self.total,
+            'file_name': self.file_name,
+            'error': self.error,
+        }
+
+
+class ExportJobRunner(object):
+    """
+    Run export jobs. This runner exports within the request, which is useful in tests and development.
+
+    Subclass it and override `submit` to hand jobs to an external queue (e.g. a Celery task), whose worker calls
+    `run_export_job(job_id, spec)`. The spec holds primitive values only, so it can be serialized.
+    """
+
+    def submit(self, job_id, spec):  # type: (Text, Dict[Text, Any]) -> None
+        run_export_job(job_id, spec)
+
+
+class ThreadPoolExportJobRunner(ExportJobRunner):
+    """Run export jobs in a pool of threads of the web process."""
+
+    def __init__(self, max_workers=2):  # type: (int) -> None
+        self.max_workers = max_workers
+        self._executor = None
+
+    def get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def submit(self, job_id, spec):
+        self.get_executor().submit(_run_export_job_closing_connections, job_id, spec)
+
+
+class ProcessPoolExportJobRunner(ThreadPoolExportJobRunner):
+    """Run export jobs in a pool of processes, which are started fresh (not forked) and set up Django themselves."""
+
+    def get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+
+def _run_export_job_closing_connections(job_id, spec):
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+    try:
+        run_export_job(job_id, spec)
+    finally:
+        connections.close_all()
+
+
+def get_export_job_spec(view, backend_index):  # type: (Any, int) -> Dict[Text, Any]
+    """Snapshot what is needed to rebuild the view and its list for the request in a worker."""
+    view_class = type(view)
+    user = getattr(view.request, 'user', None)
+    return {
+        'view': '{}.{}'.format(view_class.__module__, view_class.__qualname__),
+        'path': view.request.path,
+        'query_params': list(view.request.GET.lists()),
+        'args': list(view.args),
+        'kwargs': dict(view.kwargs),
+        'user_id': user.pk if user is not None and user.is_authenticated else None,
+        'backend': backend_index,
+    }
+
+
+def build_export_view(spec):  # type: (Dict[Text, Any]) -> Any
+    """Rebuild the view with a GET request like the one which started the job."""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = spec['path']
+    request.GET = QueryDict(mutable=True)
+    for key, values in spec['query_params']:
+        request.GET.setlist(key, values)
+    request.GET._mutable = False
+
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.models import AnonymousUser
+
+    if spec['user_id'] is not None:
+        request.user = get_user_model()._default_manager.get(pk=spec['user_id'])
+    else:
+        request.user = AnonymousUser()
+
+    view = import_string(spec['view'])()
+    view.setup(request, *spec['args'], **spec['kwargs'])
+    return view
+
+
+def run_export_job(job_id, spec):  # type: (Text, Dict[Text, Any]) -> None
+    """Export the list described by the spec to the storage of the view, updating the progress of the job."""
+    job = ExportJob.get(job_id)
+    if job is None:  # expired
+        return
+    job.state = ExportJob.RUNNING
+    job.save()
+    try:
+        view = build_export_view(spec)
+        smart_list = view.get_export_smart_list()
+        backend = copy.copy(view.export_backends[spec['backend']])
+        job.total = backend.get_queryset(smart_list).count()
+        job.save()
+
+        def update_progress(count):
+            job.progress = count
+            job.save()
+
+        backend.progress_callback = update_progress
+        content = backend.get_content(smart_list, value_renderer=view.get_export_value_renderer())
+        if isinstance(content, bytes):
+            content = [content]
+        with tempfile.TemporaryFile() as f:
+            for chunk in content:
+                f.write(chunk)
+            f.seek(0)
+            storage = view.get_export_job_storage()
+            job.storage_name = storage.save('{}/{}/{}'.format(EXPORTS_DIRECTORY, job.id, job.file_name), File(f))
+        job.state = ExportJob.DONE
+    except Exception as e:
+        logger.exception('Export job %s failed', job_id)
+        job.state = ExportJob.FAILED
+        job.error = str(e)
+    job.save()
+
+
+def delete_expired_export_files(storage, max_age=None):  # type: (Storage, Optional[int]) -> List[Text]
+    """
+    Delete the files of the export jobs which expired from the storage and return their names. The cache drops jobs
+    without notice, so run this periodically, e.g. with the `smart_list_clean_exports` management command.
+    Files older than `max_age` seconds (`ExportJob.timeout` by default) can't belong to a job which didn't expire.
+    """
+    max_age = ExportJob.timeout if max_age is None else max_age
+    try:
+        job_ids = storage.listdir(EXPORTS_DIRECTORY)[0]
+    except (IOError, OSError):  # nothing was exported yet
+        return []
+    now = timezone.now()
+    deleted = []
+    for job_id in job_ids:
+        if ExportJob.get(job_id) is not None:
+            continue
+        directory = '{}/{}'.format(EXPORTS_DIRECTORY, job_id)
+        for file_name in storage.listdir(directory)[1]:
+            name = '{}/{}'.format(directory, file_name)
+            if (now - storage.get_modified_time(name)).total_seconds() > max_age:
+                storage.delete(name)
+                deleted.append(name)
+    return deleted
+
+
+_range_re = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):  # type: (Optional[Text], int) -> Optional[Tuple[int, int]]
+    """
+    Return the first and last byte position of a single byte range, None if the whole file should be sent.
+    Raises ValueError for an unsatisfiable range.
+    """
+    match = _range_re.match(header.strip()) if header else None
+    if match is None:  # no range or several ranges, which are not supported
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:  # the last N bytes
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        first, last = int(first), min(int(last), size - 1) if last else size - 1
+    if first > last or first >= size:
+        raise ValueError('Unsatisfiable range')
+    return first, last
+
+
+def file_range_response(request, storage, name, file_name, content_type, chunk_size=64 * 1024):
+    # type: (HttpRequest, Storage, Text, Text, Text, int) -> HttpResponse
+    """Send a file from a storage, or the part of it requested by a `Range` header, so downloads can resume."""
+    size = storage.size(name)
+    try:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = 'bytes */{}'.format(size)
+        return response
+
+    first, last = byte_range or (0, size - 1)
+    f = storage.open(name, 'rb')
+    f.seek(first)
+
+    def read(remaining):  # type: (int) -> Iterator[bytes]
+        try:
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+    response = StreamingHttpResponse(read(last - first + 1), content_type=content_type)
+    if byte_range is not None:
+        response.status_code = 206
+        response['Content-Range'] = 'bytes {}-{}/{}'.format(first, last, size)
+    response['Content-Length'] = str(last - first + 1)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = 'attachment; filename={}'.format(os.path.basename(file_name))
+    return response
@@ -0,0 +1,37 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from smart_lists.indexes import iter_smart_list_views
+from smart_lists.jobs import delete_expired_export_files
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the files of expired background export jobs from the default storage and the export_job_storage '
+        'of the smart list views in the URLconf.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            default=None,
+            help='Delete files older than that many seconds only, ExportJob.timeout by default.',
+        )
+        parser.add_argument(
+            '--urlconf', default=None, help='The URLconf to look for views in, ROOT_URLCONF by default.'
+        )
+
+    def handle(self, *args, **options):
+        storages = [default_storage]
+        for route, view_class, initkwargs in iter_smart_list_views(options['urlconf']):
+            storage = initkwargs.get('export_job_storage', view_class.export_job_storage)
+            if storage is not None and all(storage is not other for other in storages):
+                storages.append(storage)
+        deleted = 0
+        for storage in storages:
+            for name in delete_expired_export_files(storage, max_age=options['max_age']):
+                if options['verbosity'] >= 2:
+                    self.stdout.write('Deleted {}'.format(name))
+                deleted += 1
+        self.stdout.write(self.style.SUCCESS('Deleted {} expired export file(s).'.format(deleted)))
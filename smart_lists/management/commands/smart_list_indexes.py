@@ -0,0 +1,62 @@
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from smart_lists.indexes import build_view, get_view_checks, iter_smart_list_views
+
+
+class Command(BaseCommand):
+    help = (
+        'Check the orderings, filters and searches of the smart list views in the URLconf with EXPLAIN '
+        'and suggest Meta.indexes entries supporting them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='The database to run EXPLAIN on.')
+        parser.add_argument(
+            '--no-explain',
+            action='store_false',
+            dest='explain',
+            help="Don't run EXPLAIN, suggest the indexes the models are missing only.",
+        )
+        parser.add_argument(
+            '--urlconf', default=None, help='The URLconf to look for views in, ROOT_URLCONF by default.'
+        )
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        suggestions = OrderedDict()
+        for route, view_class, initkwargs in iter_smart_list_views(options['urlconf']):
+            name = '{}.{}'.format(view_class.__module__, view_class.__qualname__)
+            self.stdout.write(self.style.MIGRATE_HEADING('{} ({})'.format(name, route or '/')))
+            try:
+                checks = get_view_checks(build_view(view_class, initkwargs))
+            except Exception as e:  # the view may depend on URL arguments or a user
+                self.stdout.write(self.style.WARNING('  skipped: {}'.format(e)))
+                continue
+            for check in checks:
+                if options['explain']:
+                    check.explain(using=options['database'])
+                if check.problems:
+                    self.stdout.write('  {}: {}'.format(check.description, ', '.join(check.problems)))
+                elif verbosity >= 2:
+                    self.stdout.write(
+                        '  {}: {}'.format(check.description, 'ok' if options['explain'] else 'not explained')
+                    )
+                if check.plan and verbosity >= 3:
+                    self.stdout.write('    ' + check.plan.replace('\n', '\n    '))
+                for suggestion in check.get_suggestions():
+                    suggestions.setdefault(suggestion, None)
+
+        if not suggestions:
+            self.stdout.write(self.style.SUCCESS('No indexes to suggest.'))
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING('Suggested Meta.indexes:'))
+        by_model = OrderedDict()
+        for suggestion in suggestions:
+            by_model.setdefault(suggestion.model, []).append(suggestion)
+        for model, model_suggestions in by_model.items():
+            self.stdout.write('{}:'.format(model._meta.label))
+            for suggestion in model_suggestions:
+                self.stdout.write('    {}'.format(suggestion))
@@ -1,54 +1,246 @@
+import calendar
 import datetime
 import operator
 from functools import reduce
 from numbers import Number
 
 import six
+from six.moves.urllib_parse import urlencode
 from typing import TYPE_CHECKING
 
-from django.db.models import Q
-from django.http import HttpResponse
+from django.core.exceptions import FieldDoesNotExist
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.db.models import BooleanField, Count, ForeignKey, Max, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.query import ModelIterable
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect
 from django.template.base import render_value_in_context
 from django.template.context import make_context
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
+from smart_lists.cache import (
+    CACHE_ALIAS,
+    get_models_version,
+    is_visitor_specific,
+    make_cache_key,
+    make_digest,
+    normalize_query_params,
+)
 from smart_lists.exceptions import SmartListException
 from smart_lists.filters import SmartListFilter
 from smart_lists.helpers import (
     QueryParamsMixin,
-    SmartColumn,
     SmartList,
+    get_queryset_cache_key,
+    get_related_lookups,
+    is_deferred_lookup,
     normalize_list_display_item,
+    resolve_ordering,
 )
+from smart_lists.jobs import ExportJob, file_range_response, get_export_job_spec
+from smart_lists.pagination import InvalidCursor, KeysetPaginator
+from smart_lists.search import SmartListSearchEngine
 
 if TYPE_CHECKING:
     from typing import (
+        Dict,
         List,
+        Optional,
         Tuple,
     )
+    from django.core.files.storage import Storage
+    from django.db.models import QuerySet
     from smart_lists.exports import SmartListExportBackend
+    from smart_lists.jobs import ExportJobRunner
 
 
 class SmartListMixin(QueryParamsMixin):
     list_display = ()  # type: Tuple[str]
     list_filter = ()  # type: Tuple[str]
+    # ForeignKey filters list at most this many values, None means no limit
+    list_filter_max_values = 200  # type: Optional[int]
+    # label fields of the related models of ForeignKey filters, e.g. {'customer': 'name'}, so that only
+    # the primary key and the label are fetched instead of whole objects rendered with __str__
+    list_filter_label_fields = {}  # type: Dict[str, str]
+    # show the number of objects for the values of choice, boolean and ForeignKey filters
+    list_filter_counts = False
+    list_filter_counts_cache_timeout = None  # type: Optional[int]
+    # cache values of ForeignKey filters, and lookups of SmartListFilters which define `lookups_cache_models`,
+    # until objects of the involved models change or the timeout (None means no timeout) passes
+    list_filter_cache = False
+    list_filter_cache_timeout = None  # type: Optional[int]
     search_fields = ()  # type: Tuple[str]
+    # matches search terms in search_fields, e.g. PostgresFullTextSearchEngine(config='english')
+    search_engine = SmartListSearchEngine()
     export_backends = []  # type: List[SmartListExportBackend]
+    # run exports in the background with this runner (e.g. ThreadPoolExportJobRunner()) instead of within the request,
+    # export files are written to `export_job_storage` (the default storage if None)
+    export_job_runner = None  # type: Optional[ExportJobRunner]
+    export_job_storage = None  # type: Optional[Storage]
+    # cache the output of the smart_list tag or the whole response for that many seconds, None disables the cache;
+    # cached output is dropped when objects of the model or of `cache_models` are saved or deleted
+    smart_list_cache_timeout = None  # type: Optional[int]
+    response_cache_timeout = None  # type: Optional[int]
+    cache_models = ()  # type: Tuple[type]
+    # answer conditional requests (If-None-Match, If-Modified-Since) with 304 Not Modified before building the list,
+    # see get_validators; `last_modified_field` is a date(time) field updated on every change, e.g. 'updated_at'
+    conditional_response = False
+    last_modified_field = None  # type: Optional[str]
     date_hierarchy = ''
 
     ordering = []  # type: List[str]
+    # the ordering query parameter takes at most this many columns, None means the number of columns
+    ordering_max_terms = None  # type: Optional[int]
+    # sort nulls last in both directions when ordering by columns
+    ordering_nulls_last = False
+    # follow relations used by list_display with select_related/prefetch_related
+    auto_related_lookups = True
+    # load only the fields required by list_display, callables declare the fields they use with `required_fields`
+    projection = False
+    # paginate with a cursor pointing at the last row shown instead of page numbers
+    keyset_pagination = False
+    # render the table body in Python instead of the template, the markup is the same
+    fast_table_rendering = False
     ordering_query_parameter_name = 'o'
     search_query_parameter_name = 'q'
     export_query_parameter_name = 'e'
+    export_job_query_parameter_name = 'export_job'
+    cursor_query_parameter_name = 'cursor'
 
     def get_queryset(self):
         qs = super(SmartListMixin, self).get_queryset()
+        if self.auto_related_lookups:
+            qs = self.apply_related_lookups(qs)
+        if self.projection:
+            qs = self.apply_projection(qs)
         return self.smart_filter_queryset(qs)
 
     def get(self, request, *args, **kwargs):
+        if self.export_job_query_parameter_name in request.GET:
+            return self.handle_export_job(request)
+        if not self.conditional_response:
+            return self.get_list_response(request, *args, **kwargs)
+
+        etag, last_modified = self.get_validators()
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.get_list_response(request, *args, **kwargs)
+        return self.add_validators(response, etag, last_modified)
+
+    def add_validators(
+        self, response, etag, last_modified
+    ):  # type: (HttpResponse, Optional[str], Optional[int]) -> HttpResponse
+        if response.status_code in (200, 304):
+            if etag is not None and not response.has_header('ETag'):
+                response['ETag'] = etag
+            if last_modified is not None and not response.has_header('Last-Modified'):
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_list_response(self, request, *args, **kwargs):
         if self.export_query_parameter_name in request.GET:
             return self.handle_export(request)
-        return super(SmartListMixin, self).get(request, *args, **kwargs)
+        if self.response_cache_timeout is None:
+            return super(SmartListMixin, self).get(request, *args, **kwargs)
+
+        cache = caches[CACHE_ALIAS]
+        cache_key = self.get_cache_key('response')
+        response = cache.get(cache_key)
+        if response is not None:
+            return response
+        response = super(SmartListMixin, self).get(request, *args, **kwargs)
+
+        def store(response):
+            if not is_visitor_specific(request, response):
+                cache.set(cache_key, response, self.response_cache_timeout)
+
+        if response.status_code == 200 and not response.streaming:
+            if callable(getattr(response, 'render', None)):
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+        return response
+
+    def get_list_version(self):  # type: () -> Optional[str]
+        """
+        Return a string which changes whenever the list changes, e.g. from a counter kept by the application,
+        to be used in the ETag instead of querying the database. None queries the count (and the latest
+        `last_modified_field`) of the filtered objects.
+        """
+        return None
+
+    def get_validators(self):  # type: () -> Tuple[Optional[str], Optional[int]]
+        """
+        Return the ETag and the Last-Modified timestamp of the list for the current request, with one aggregate
+        query over the filtered objects at most. The ETag covers the query parameters (filters, search, ordering,
+        page, export), so any change of them or of the objects gives a different ETag.
+        """
+        version = self.get_list_version()
+        last_modified = None
+        if version is None:
+            aggregates = {'count': Count('pk')}
+            if self.last_modified_field:
+                aggregates['last_modified'] = Max(self.last_modified_field)
+            values = self.get_queryset().order_by().aggregate(**aggregates)
+            last_modified = values.get('last_modified')
+            version = '{}.{}'.format(values['count'], last_modified)
+            if last_modified is not None:
+                if not isinstance(last_modified, datetime.datetime):
+                    last_modified = datetime.datetime.combine(last_modified, datetime.time())
+                if timezone.is_naive(last_modified):
+                    last_modified = timezone.make_aware(last_modified)
+                last_modified = calendar.timegm(last_modified.utctimetuple())
+        etag = quote_etag(make_digest(version, *self.get_cache_key_parts()))
+        return etag, last_modified
+
+    def get_cache_models(self):  # type: () -> List[type]
+        return [self.model] + list(self.cache_models)
+
+    def get_cache_permissions_key(self):  # type: () -> str
+        """Identify what the user may see in the list, users with the same key share cached output."""
+        user = getattr(self.request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return 'anonymous'
+        if user.is_superuser:
+            return 'superuser'
+        return ','.join(sorted(user.get_all_permissions()))
+
+    def get_cache_key(self, prefix, *extra):  # type: (str, object) -> str
+        """
+        Return a key for cached output of this view. It depends on the view, the path, the query parameters
+        (normalized), the permissions of the user and the versions of `get_cache_models`.
+        """
+        return make_cache_key(prefix, extra, *self.get_cache_key_parts())
+
+    def get_cache_key_parts(self):  # type: () -> Tuple
+        view_class = type(self)
+        return (
+            view_class.__module__,
+            view_class.__name__,
+            self.request.path,
+            normalize_query_params(self.request.GET),
+            self.get_cache_permissions_key(),
+            get_models_version(*self.get_cache_models()),
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.keyset_pagination:
+            return super(SmartListMixin, self).paginate_queryset(queryset, page_size)
+        try:
+            paginator = KeysetPaginator(
+                queryset, page_size, query_params=self.request.GET, cursor_query_param=self.cursor_query_parameter_name
+            )
+        except SmartListException:  # ordering by expressions or with nulls_last, which offsets can paginate only
+            return super(SmartListMixin, self).paginate_queryset(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_query_parameter_name))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
 
     @property
     def query_params(self):
@@ -61,11 +253,14 @@ class SmartListMixin(QueryParamsMixin):
                 ordering = (ordering,)
             qs = qs.order_by(*ordering)
         qs = self.apply_filters(qs)
-        search_filters = self.get_search_filters()
-        if search_filters:
-            for fltr in search_filters:
-                qs = qs.filter(fltr)
-        return qs
+        return self.apply_search(qs)
+
+    def get_search_engine(self):  # type: () -> SmartListSearchEngine
+        return self.search_engine
+
+    def apply_search(self, qs):
+        search_term = self.request.GET.get(self.search_query_parameter_name, '')
+        return self.get_search_engine().search(qs, self.search_fields, search_term)
 
     def get_search_filters(self):
         """
@@ -73,56 +268,111 @@ class SmartListMixin(QueryParamsMixin):
         @return: list of search filters
         """
         search_term = self.request.GET.get(self.search_query_parameter_name, '')
-        if len(search_term) >= 0:
-
-            def construct_search(field_name):
-                if field_name.startswith('^'):
-                    return "%s__istartswith" % field_name[1:]
-                elif field_name.startswith('='):
-                    return "%s__iexact" % field_name[1:]
-                elif field_name.startswith('@'):
-                    return "%s__search" % field_name[1:]
-                else:
-                    return "%s__icontains" % field_name
-
-            search_filters = []
-            if self.search_fields and search_term:
-                orm_lookups = [construct_search(str(search_field)) for search_field in self.search_fields]
-                search_filters = []
-                for bit in search_term.split():
-                    or_queries = [Q(**{orm_lookup: bit}) for orm_lookup in orm_lookups]
-                    search_filters.append(reduce(operator.or_, or_queries))
-            return search_filters
+        if not self.search_fields or not search_term:
+            return []
+        return self.get_search_engine().get_filters(self.search_fields, search_term)
 
     def get_ordering(self):
         custom_order = self.request.GET.get(self.ordering_query_parameter_name)
         if custom_order:
-            order_list = custom_order.split(".")
-            ordering = []
-            for i, order in enumerate(order_list, start=1):
-                prefix = ''
-                try:
-                    if order.startswith("-"):
-                        prefix = '-'
-                        order = int(order[1:])
-                    else:
-                        order = int(order)
-                    field_name, render_function, label = normalize_list_display_item(self.list_display[order - 1])
-                    sc = SmartColumn(
-                        model=self.model,
-                        field=field_name,
-                        column_id=i,
-                        query_params=self.request.GET,
-                        ordering_query_param=self.ordering_query_parameter_name,
-                        label=label,
-                        render_function=render_function,
-                    )
-                    ordering.append('{}{}'.format(prefix, sc.order_field))
-                except (ValueError, IndexError) as e:
-                    raise SmartListException("Illegal ordering")
-            return ordering
+            return resolve_ordering(
+                self.model,
+                self.get_list_display(),
+                custom_order,
+                max_terms=self.ordering_max_terms,
+                nulls_last=self.ordering_nulls_last,
+                view_class=type(self),
+            )
         return self.ordering
 
+    def get_related_lookups(self, model):  # type: (type) -> Tuple[List[str], List[str]]
+        """
+        Return the relations displayed by list_display, split into select_related and prefetch_related lookups.
+        Callables can point at the relations they use with `admin_order_field`.
+        """
+        lookups = []
+        for item in self.get_list_display():
+            field_name, render_function, label = normalize_list_display_item(item)
+            if field_name:
+                lookups.append(field_name)
+            func = render_function or getattr(model, field_name or '', None)
+            order_field = getattr(func, 'admin_order_field', None) if callable(func) else None
+            if isinstance(order_field, six.string_types):
+                lookups.append(order_field.lstrip('-'))
+            lookups.extend(getattr(func, 'required_fields', ()) if callable(func) else ())
+        return get_related_lookups(model, lookups)
+
+    def apply_related_lookups(self, qs):
+        if not issubclass(qs._iterable_class, ModelIterable):
+            return qs  # there are no model instances to attach related objects to in .values() querysets
+        if qs.query.combinator:
+            return qs  # union(), intersection() and difference() querysets can't be altered
+        select_related, prefetch_related = self.get_related_lookups(qs.model)
+        select_related = [lookup for lookup in select_related if not is_deferred_lookup(qs.query, lookup)]
+        if select_related:
+            qs = qs.select_related(*select_related)
+        if prefetch_related:
+            qs = qs.prefetch_related(*prefetch_related)
+        return qs
+
+    def get_projection_fields(self, model):  # type: (type) -> Optional[List[str]]
+        """
+        Return names of the fields required to display list_display or None when they can't be determined,
+        i.e. a callable column doesn't declare the fields it uses with `required_fields`.
+        """
+        list_display = self.get_list_display()
+        if not list_display:
+            return None  # `__str__` is displayed
+        fields = []
+        for item in list_display:
+            field_name, render_function, label = normalize_list_display_item(item)
+            func = render_function
+            if not func:
+                try:
+                    field = model._meta.get_field(field_name)
+                except FieldDoesNotExist:
+                    func = getattr(model, field_name, None)
+                else:
+                    if field.concrete:  # many-to-many and reverse relations are prefetched instead
+                        fields.append(field_name)
+                    continue
+            required_fields = getattr(func, 'required_fields', None) if callable(func) else None
+            if required_fields is None:
+                return None
+            fields.extend(required_fields)
+        return fields
+
+    def can_project_to_values(self, model):  # type: (type) -> bool
+        """
+        Return whether rows can be fetched as dicts. It is possible when list_display consists only of plain fields,
+        which are displayed the same way from a dict, and the model doesn't provide links to its objects.
+        Keyset pagination reads the cursor from model instances, as the ordering may use fields which aren't displayed.
+        """
+        if self.keyset_pagination or not self.get_list_display() or hasattr(model, 'get_absolute_url'):
+            return False
+        for item in self.get_list_display():
+            field_name, render_function, label = normalize_list_display_item(item)
+            if render_function:
+                return False
+            try:
+                field = model._meta.get_field(field_name)
+            except FieldDoesNotExist:
+                return False
+            if not field.concrete or field.is_relation or field.choices:
+                return False
+        return True
+
+    def apply_projection(self, qs):
+        if not issubclass(qs._iterable_class, ModelIterable) or qs.query.select_related is True:
+            return qs
+        fields = self.get_projection_fields(qs.model)
+        if fields is None:
+            return qs
+        if self.can_project_to_values(qs.model):
+            return qs.values(*fields)
+        # relations joined with select_related cannot be deferred
+        return qs.only(*(fields + _select_related_paths(qs.query.select_related)))
+
     def apply_filters(self, qs):
         for fltr in self.list_filter:
             parameter_name = fltr
@@ -133,6 +383,84 @@ class SmartListMixin(QueryParamsMixin):
                     qs = qs.filter(**{parameter_name: self.request.GET[parameter_name]})
         return qs
 
+    def get_filter_counts(self):  # type: () -> Dict[str, Dict[Optional[str], int]]
+        """
+        Return numbers of objects for the values of choice, boolean and ForeignKey filters, keyed by parameter name
+        and then by the value as used in the query string (None stands for all values).
+
+        Every filter is counted against the current list without its own filter applied. Choice and boolean filters
+        are all counted in a single query with conditional aggregates, ForeignKey filters with one grouped query each.
+        """
+        if getattr(self, '_filter_counts', None) is not None:
+            return self._filter_counts
+
+        qs = super(SmartListMixin, self).get_queryset().order_by()
+        field_filters = []
+        for fltr in self.list_filter:
+            if type(fltr) != str and issubclass(fltr, SmartListFilter):
+                qs = fltr(self.request).queryset(qs)
+            else:
+                field_filters.append(fltr)
+        qs = self.apply_search(qs).order_by()
+
+        active_filters = {
+            parameter_name: Q(**{parameter_name: self.request.GET[parameter_name]})
+            for parameter_name in field_filters
+            if parameter_name in self.request.GET
+        }
+        cache_key = None
+        if self.list_filter_counts_cache_timeout is not None:
+            cache_key = get_queryset_cache_key(
+                'filter_counts', qs, sorted((name, self.request.GET[name]) for name in active_filters), field_filters
+            )
+            counts = caches[CACHE_ALIAS].get(cache_key) if cache_key else None
+            if counts is not None:
+                self._filter_counts = counts
+                return counts
+
+        def other_filters(parameter_name):
+            return reduce(operator.and_, [q for name, q in active_filters.items() if name != parameter_name], Q())
+
+        counts = {}
+        aggregates = {}
+        choices = {}
+        for index, parameter_name in enumerate(field_filters):
+            model_field = qs.model._meta.get_field(parameter_name)
+            others = other_filters(parameter_name)
+            if model_field.choices:
+                choices[parameter_name] = [(str(value), value) for value, label in model_field.flatchoices]
+            elif type(model_field) == BooleanField:
+                choices[parameter_name] = [('1', True), ('0', False)]
+            elif issubclass(type(model_field), ForeignKey):
+                rows = qs.filter(others).values_list(parameter_name).annotate(count=Count('pk')).order_by()
+                counts[parameter_name] = {None: 0}
+                for value, count in rows:
+                    counts[parameter_name][None] += count
+                    if value is not None:
+                        counts[parameter_name][str(value)] = count
+                continue
+            else:
+                continue
+            aggregates['filter_{}'.format(index)] = Count('pk', filter=others)
+            for choice_index, (key, value) in enumerate(choices[parameter_name]):
+                aggregates['filter_{}_{}'.format(index, choice_index)] = Count(
+                    'pk', filter=others & Q(**{parameter_name: value})
+                )
+
+        if aggregates:
+            result = qs.aggregate(**aggregates)
+            for index, parameter_name in enumerate(field_filters):
+                if parameter_name not in choices:
+                    continue
+                counts[parameter_name] = {None: result['filter_{}'.format(index)]}
+                for choice_index, (key, value) in enumerate(choices[parameter_name]):
+                    counts[parameter_name][key] = result['filter_{}_{}'.format(index, choice_index)]
+
+        if cache_key:
+            caches[CACHE_ALIAS].set(cache_key, counts, self.list_filter_counts_cache_timeout)
+        self._filter_counts = counts
+        return counts
+
     def get_list_display(self):
         return list(self.list_display)
 
@@ -152,6 +480,7 @@ class SmartListMixin(QueryParamsMixin):
             'ordering_query_param': self.ordering_query_parameter_name,
             'search_query_param': self.search_query_parameter_name,
             'query_params': self.request.GET,
+            'fast_table_rendering': self.fast_table_rendering,
             'exports': [
                 {
                     'url': self.get_url_with_query_params({self.export_query_parameter_name: i}),
@@ -161,36 +490,107 @@ class SmartListMixin(QueryParamsMixin):
             ],
         }
 
+    def get_export_smart_list(self):  # type: () -> SmartList
+        return self.get_smart_list(self.get_queryset())
+
+    def get_smart_list(self, object_list, smart_list_settings=None):  # type: (QuerySet, Optional[Dict]) -> SmartList
+        smart_list_settings = smart_list_settings or self.get_smart_list_settings()
+        return SmartList(
+            object_list,
+            query_params=smart_list_settings['query_params'],
+            list_display=smart_list_settings['list_display'],
+            list_filter=smart_list_settings['list_filter'],
+            list_search=smart_list_settings['list_search'],
+            search_query_param=smart_list_settings['search_query_param'],
+            ordering_query_param=smart_list_settings['ordering_query_param'],
+            view=self,
+        )
+
+    def get_export_value_renderer(self):
+        value_rendering_context = make_context({}, request=self.request, autoescape=False)
+
+        def value_renderer(value):
+            if isinstance(value, (Number, datetime.date)):
+                return value
+            return render_value_in_context(value, context=value_rendering_context)
+
+        return value_renderer
+
     def handle_export(self, request):
         try:
-            export_backend = self.export_backends[int(request.GET[self.export_query_parameter_name])]
+            backend_index = int(request.GET[self.export_query_parameter_name])
+            export_backend = self.export_backends[backend_index]
         except (IndexError, TypeError, ValueError):
             return redirect(
                 request.path + self.get_url_with_query_params({}, without=[self.export_query_parameter_name])
             )
         else:
-            smart_list_settings = self.get_smart_list_settings()
-            smart_list_instance = SmartList(
-                self.get_queryset(),
-                query_params=smart_list_settings['query_params'],
-                list_display=smart_list_settings['list_display'],
-                list_filter=smart_list_settings['list_filter'],
-                list_search=smart_list_settings['list_search'],
-                search_query_param=smart_list_settings['search_query_param'],
-                ordering_query_param=smart_list_settings['ordering_query_param'],
-                view=self,
-            )
+            if self.export_job_runner is not None:
+                return self.start_export_job(backend_index)
 
-            value_rendering_context = make_context({}, request=request, autoescape=False)
-
-            def value_renderer(value):
-                if isinstance(value, (Number, datetime.date)):
-                    return value
-                return render_value_in_context(value, context=value_rendering_context)
-
-            response = HttpResponse(
-                export_backend.get_content(smart_list_instance, value_renderer=value_renderer),
-                content_type=export_backend.content_type,
+            content = export_backend.get_content(
+                self.get_export_smart_list(), value_renderer=self.get_export_value_renderer()
             )
+            if export_backend.streaming:
+                response = StreamingHttpResponse(content, content_type=export_backend.content_type)
+            else:
+                response = HttpResponse(content, content_type=export_backend.content_type)
             response['Content-Disposition'] = 'attachment; filename={}'.format(export_backend.file_name)
             return response
+
+    def get_export_job_storage(self):  # type: () -> Storage
+        return self.export_job_storage or default_storage
+
+    def get_export_job_url(self, job, download=False):  # type: (ExportJob, bool) -> str
+        params = {self.export_job_query_parameter_name: job.id}
+        if download:
+            params['download'] = 1
+        return self.request.path + '?' + urlencode(params)
+
+    def get_export_job_status(self, job):  # type: (ExportJob) -> Dict
+        status = job.to_dict()
+        status['status_url'] = self.get_export_job_url(job)
+        if job.state == ExportJob.DONE:
+            status['download_url'] = self.get_export_job_url(job, download=True)
+        return status
+
+    def start_export_job(self, backend_index):  # type: (int) -> HttpResponse
+        """Enqueue a job exporting the list in the background and answer with its status right away."""
+        export_backend = self.export_backends[backend_index]
+        user = getattr(self.request, 'user', None)
+        job = ExportJob(
+            user.pk if user is not None and user.is_authenticated else None,
+            export_backend.file_name,
+            export_backend.content_type,
+        )
+        job.save()
+        self.export_job_runner.submit(job.id, get_export_job_spec(self, backend_index))
+        job = ExportJob.get(job.id) or job  # the runner may have finished it already
+        response = JsonResponse(self.get_export_job_status(job), status=202)
+        response['Location'] = self.get_export_job_url(job)
+        return response
+
+    def handle_export_job(self, request):
+        """Answer with the status of an export job, or send its file (with `Range` support) when asked to."""
+        job = ExportJob.get(request.GET[self.export_job_query_parameter_name])
+        user = getattr(request, 'user', None)
+        user_id = user.pk if user is not None and user.is_authenticated else None
+        if job is None or job.user_id != user_id:
+            raise Http404('Export job not found')
+        if 'download' not in request.GET:
+            return JsonResponse(self.get_export_job_status(job))
+        if job.state != ExportJob.DONE:
+            raise Http404('Export is not finished')
+        return file_range_response(
+            request, self.get_export_job_storage(), job.storage_name, job.file_name, job.content_type
+        )
+
+
+def _select_related_paths(select_related, prefix=''):
+    """Return lookups of the relations in the nested dict of a Query.select_related."""
+    paths = []
+    if isinstance(select_related, dict):
+        for name, nested in select_related.items():
+            paths.append(prefix + name)
+            paths.extend(_select_related_paths(nested, prefix + name + LOOKUP_SEP))
+    return paths
@@ -0,0 +1,348 @@
+import base64
+import binascii
+import json
+import operator
+from functools import reduce
+
+import six
+from typing import TYPE_CHECKING
+
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist, ValidationError
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.query import ModelIterable, ValuesIterable
+from django.utils.functional import cached_property
+
+from smart_lists.exceptions import SmartListException
+from smart_lists.helpers import QueryParamsMixin, get_queryset_cache_key
+
+if TYPE_CHECKING:
+    from typing import Any, List, Optional, Sequence, Set, Tuple
+    from django.db.models import Field
+
+
+class InvalidCursor(SmartListException):
+    pass
+
+
+class SmartListPaginator(Paginator):
+    """
+    Paginator which avoids repeating expensive `COUNT(*)` queries and renders a window of page numbers.
+
+    - `count_cache_timeout` caches counts for that many seconds, per database query (filters, search and ordering).
+    - `estimate_count_threshold` uses the planner's row estimate (PostgreSQL only) instead of counting when
+      the estimate exceeds the threshold.
+    - `pages_on_each_side` and `pages_on_ends` define which page numbers are shown around the current page
+      and at the ends of the page range, the rest is replaced with an ellipsis.
+    """
+
+    count_cache_timeout = None  # type: Optional[int]
+    count_cache_alias = 'default'
+    estimate_count_threshold = None  # type: Optional[int]
+    pages_on_each_side = 3
+    pages_on_ends = 2
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        super(SmartListPaginator, self).__init__(
+            object_list, per_page, orphans=orphans, allow_empty_first_page=allow_empty_first_page
+        )
+        for key, value in kwargs.items():
+            if not hasattr(type(self), key):
+                raise TypeError("SmartListPaginator() got an unexpected keyword argument '{}'".format(key))
+            setattr(self, key, value)
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super(SmartListPaginator, self).count
+
+        cache_key = self.get_count_cache_key()
+        if self.count_cache_timeout is not None and cache_key is not None:
+            count = caches[self.count_cache_alias].get(cache_key)
+            if count is not None:
+                return count
+
+        count = None
+        if self.estimate_count_threshold is not None:
+            count = self.get_estimated_count()
+            if count is not None and count < self.estimate_count_threshold:
+                count = None
+        if count is None:
+            count = self.object_list.count()
+
+        if self.count_cache_timeout is not None and cache_key is not None:
+            caches[self.count_cache_alias].set(cache_key, count, self.count_cache_timeout)
+        return count
+
+    def get_count_cache_key(self):  # type: () -> Optional[str]
+        return get_queryset_cache_key('count', self.object_list)
+
+    def get_estimated_count(self):  # type: () -> Optional[int]
+        """Return the number of rows estimated by the query planner or None if the database can't provide it."""
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return None
+        query = self.object_list.order_by().query
+        with connection.cursor() as cursor:
+            if not query.where and not query.distinct and not query.low_mark and query.high_mark is None:
+                # the whole table is counted, its size is kept in the catalog
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [self.object_list.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+                if row and row[0] >= 0:
+                    return int(row[0])
+            try:
+                sql, params = query.sql_with_params()
+            except EmptyResultSet:
+                return 0
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, six.string_types):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def get_page_window(self, number):  # type: (int) -> List[Optional[int]]
+        """Return page numbers to display around the given page, None stands for the skipped pages."""
+        number = self.validate_number(number)
+        on_each_side, on_ends = self.pages_on_each_side, self.pages_on_ends
+        if self.num_pages <= (on_each_side + on_ends) * 2 + 1:
+            return list(self.page_range)
+
+        window = []  # type: List[Optional[int]]
+        if number > on_each_side + on_ends + 1:
+            window.extend(range(1, on_ends + 1))
+            window.append(None)
+            window.extend(range(number - on_each_side, number + 1))
+        else:
+            window.extend(range(1, number + 1))
+        if number < self.num_pages - on_each_side - on_ends:
+            window.extend(range(number + 1, number + on_each_side + 1))
+            window.append(None)
+            window.extend(range(self.num_pages - on_ends + 1, self.num_pages + 1))
+        else:
+            window.extend(range(number + 1, self.num_pages + 1))
+        return window
+
+    def _get_page(self, *args, **kwargs):
+        return SmartListPage(*args, **kwargs)
+
+
+class SmartListPage(Page):
+    @property
+    def page_window(self):  # type: () -> List[Optional[int]]
+        return self.paginator.get_page_window(self.number)
+
+
+class KeysetOrderingTerm(object):
+    def __init__(self, path, descending, field):  # type: (str, bool, Field) -> None
+        self.path = path
+        self.descending = descending
+        self.field = field
+
+    def __str__(self):
+        return '{}{}'.format('-' if self.descending else '', self.path)
+
+    def get_value(self, obj):  # type: (Any) -> Any
+        if isinstance(obj, dict):
+            return obj[self.path]
+        for part in self.path.split(LOOKUP_SEP):
+            if obj is None:
+                break
+            obj = getattr(obj, part)
+        return obj
+
+    def equal(self, value):  # type: (Any) -> Q
+        if value is None:
+            return Q(**{self.path + '__isnull': True})
+        return Q(**{self.path: value})
+
+    def after(self, value, reverse, nulls_order_largest):  # type: (Any, bool, bool) -> Optional[Q]
+        """Return a filter matching the values following the given one, None when no value can follow it."""
+        descending = self.descending != reverse
+        nulls_last = self.field.null and nulls_order_largest != descending
+        if value is None:
+            return None if nulls_last else Q(**{self.path + '__isnull': False})
+        after = Q(**{'{}__{}'.format(self.path, 'lt' if descending else 'gt'): value})
+        if nulls_last:
+            after |= Q(**{self.path + '__isnull': True})
+        return after
+
+
+class KeysetPaginator(QueryParamsMixin, object):
+    """
+    Paginate by filtering on the ordering values of the last (or first) row shown instead of using OFFSET,
+    so every page costs the same. The position is kept in an opaque cursor in the query string.
+
+    A unique primary key tiebreaker is added to the ordering. Only orderings by (possibly related) field names
+    are supported.
+    """
+
+    keyset = True
+
+    def __init__(
+        self, object_list, per_page, query_params=None, cursor_query_param='cursor'
+    ):  # type: (QuerySet, int, Optional[dict], str) -> None
+        self.per_page = int(per_page)
+        self.query_params = query_params or {}
+        self.cursor_query_param = cursor_query_param
+        self.terms = self.get_ordering_terms(object_list)
+        self.object_list = object_list.order_by(*(str(term) for term in self.terms))
+        self.nulls_order_largest = connections[object_list.db].features.nulls_order_largest
+
+    def get_ordering_terms(self, object_list):  # type: (QuerySet) -> List[KeysetOrderingTerm]
+        model = object_list.model
+        if object_list.query.order_by:
+            ordering = object_list.query.order_by
+        elif object_list.query.default_ordering:
+            ordering = model._meta.ordering
+        else:
+            ordering = []
+
+        terms = []
+        for order in ordering:
+            if not isinstance(order, six.string_types) or order == '?':
+                raise SmartListException("Keyset pagination supports only ordering by field names")
+            descending = order.startswith('-')
+            path = order.lstrip('-')
+            terms.append(self.resolve_term(model, path, descending))
+        if not any(term.path == model._meta.pk.attname for term in terms):
+            # make the ordering unique, otherwise rows with equal values could be skipped or repeated
+            terms.append(self.resolve_term(model, 'pk', terms[-1].descending if terms else False))
+        if not issubclass(object_list._iterable_class, ModelIterable):
+            fields = self.get_values_fields(object_list)
+            if not all(term.path in fields for term in terms):
+                raise SmartListException("Keyset pagination needs the ordering fields and the primary key in values()")
+        return terms
+
+    def get_values_fields(self, object_list):  # type: (QuerySet) -> Set[str]
+        """Return the keys of the dicts returned by a .values() queryset, nothing for other kinds of rows."""
+        if not issubclass(object_list._iterable_class, ValuesIterable):
+            return set()  # .values_list() rows are tuples
+        query = object_list.query
+        fields = set(query.values_select) | set(query.annotation_select) | set(query.extra_select)
+        if not query.values_select:
+            fields.update(field.attname for field in object_list.model._meta.concrete_fields)
+        return fields
+
+    def resolve_term(self, model, path, descending):  # type: (type, str, bool) -> KeysetOrderingTerm
+        opts = model._meta
+        parts = path.split(LOOKUP_SEP)
+        for i, part in enumerate(parts):
+            try:
+                field = opts.pk if part == 'pk' else opts.get_field(part)
+            except FieldDoesNotExist:
+                raise SmartListException("Keyset pagination cannot order by {}".format(path))
+            if i < len(parts) - 1:
+                if not field.is_relation or field.related_model is None:
+                    raise SmartListException("Keyset pagination cannot order by {}".format(path))
+                opts = field.related_model._meta
+        if not field.concrete or field.many_to_many:
+            raise SmartListException("Keyset pagination cannot order by {}".format(path))
+        # order by the column itself, ordering by a relation would use the related model's Meta.ordering
+        parts[-1] = field.attname
+        return KeysetOrderingTerm(LOOKUP_SEP.join(parts), descending, field)
+
+    def encode_cursor(self, obj, reverse=False):  # type: (Any, bool) -> str
+        payload = {
+            'o': [str(term) for term in self.terms],
+            'v': [term.get_value(obj) for term in self.terms],
+            'r': reverse,
+        }
+        data = json.dumps(payload, default=str, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):  # type: (str) -> Optional[Tuple[List[Any], bool]]
+        """Return the values and direction stored in the cursor, or None if it was made for another ordering."""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(str(cursor) + '=' * (-len(cursor) % 4)).decode())
+            if payload['o'] != [str(term) for term in self.terms]:
+                return None
+            if len(payload['v']) != len(self.terms):
+                raise ValueError
+            values = [
+                None if value is None else term.field.to_python(value) for term, value in zip(self.terms, payload['v'])
+            ]
+            return values, bool(payload['r'])
+        except (binascii.Error, TypeError, ValueError, KeyError, ValidationError):
+            raise InvalidCursor("Invalid cursor")
+
+    def get_filter(self, values, reverse=False, inclusive=False):  # type: (Sequence[Any], bool, bool) -> Q
+        """Return a filter matching rows which follow the given ordering values."""
+        alternatives = []
+        equal = Q()
+        for term, value in zip(self.terms, values):
+            after = term.after(value, reverse, self.nulls_order_largest)
+            if after is not None:
+                alternatives.append(equal & after)
+            equal &= term.equal(value)
+        if inclusive:
+            alternatives.append(equal)
+        if not alternatives:
+            return Q(pk__in=[])
+        return reduce(operator.or_, alternatives)
+
+    def page(self, cursor=None):  # type: (Optional[str]) -> KeysetPage
+        decoded = self.decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            return self.get_first_page()
+        values, reverse = decoded
+        if not reverse:
+            object_list = self.object_list.filter(self.get_filter(values))
+            return KeysetPage(self, object_list[: self.per_page], True, self.has_more(object_list))
+
+        # find the first row of the previous page by walking back from the cursor
+        preceding = self.object_list.filter(self.get_filter(values, reverse=True)).reverse()
+        paths = [term.path for term in self.terms]
+        boundaries = list(preceding.values_list(*paths)[self.per_page - 1 : self.per_page + 1])
+        if not boundaries:
+            return self.get_first_page()
+        object_list = self.object_list.filter(self.get_filter(boundaries[0], inclusive=True))
+        return KeysetPage(self, object_list[: self.per_page], len(boundaries) > 1, True)
+
+    def get_first_page(self):  # type: () -> KeysetPage
+        return KeysetPage(self, self.object_list[: self.per_page], False, self.has_more(self.object_list))
+
+    def has_more(self, object_list):  # type: (QuerySet) -> bool
+        # .exists() would drop the ordering the offset depends on
+        return bool(object_list.values_list('pk', flat=True)[self.per_page : self.per_page + 1])
+
+    def get_cursor_url(self, cursor):  # type: (str) -> str
+        return self.get_url_with_query_params({self.cursor_query_param: cursor}, without=['page'])
+
+
+class KeysetPage(object):
+    def __init__(self, paginator, object_list, has_previous, has_next):
+        self.paginator = paginator
+        self.object_list = object_list
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return '<Keyset page>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return list(self.object_list)[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    def get_next_url(self):
+        if self.has_next():
+            return self.paginator.get_cursor_url(self.paginator.encode_cursor(self[-1]))
+
+    def get_previous_url(self):
+        if self.has_previous():
+            return self.paginator.get_cursor_url(self.paginator.encode_cursor(self[0], reverse=True))
@@ -0,0 +1,286 @@
+import operator
+from functools import reduce
+
+from typing import TYPE_CHECKING
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import RawSQL
+
+from smart_lists.exceptions import SmartListException
+
+if TYPE_CHECKING:
+    from typing import List, Sequence, Text, Tuple
+    from django.db.models import QuerySet
+
+
+def lookup_spawns_duplicates(model, lookup_path):  # type: (type, Text) -> bool
+    """Return True if the lookup follows a multi-valued relation, which may return an object more than once."""
+    opts = model._meta
+    for name in lookup_path.split(LOOKUP_SEP):
+        if name == 'pk':
+            name = opts.pk.name
+        try:
+            field = opts.get_field(name)
+        except FieldDoesNotExist:  # a lookup or a transform
+            break
+        if hasattr(field, 'get_path_info'):
+            path_info = field.get_path_info()
+            if any(path.m2m for path in path_info):
+                return True
+            opts = path_info[-1].to_opts
+    return False
+
+
+class SmartListSearchEngine(object):
+    """
+    Search the objects for every whitespace-separated term in the `search_fields` of a view.
+
+    Search fields can be prefixed like in django admin: `^` matches the beginning of the field, `=` matches
+    the whole field and `@` uses the database full-text `search` lookup. Fields without a prefix are matched
+    by `match_fields`, which contains them anywhere in this engine. Other engines replace it with an index
+    friendly full-text or similarity match while keeping the prefixes.
+    """
+
+    prefix_lookups = {'^': 'istartswith', '=': 'iexact', '@': 'search'}
+    default_lookup = 'icontains'
+    # match fields across multi-valued relations in primary key subqueries, False chains a filter per term
+    multi_valued_subqueries = True
+
+    def split_fields(self, search_fields):  # type: (Sequence[Text]) -> Tuple[List[Text], List[Text]]
+        """Split search fields into lookups for the prefixed fields and names of the fields without prefix."""
+        lookups, text_fields = [], []
+        for search_field in search_fields:
+            search_field = str(search_field)
+            if search_field[:1] in self.prefix_lookups:
+                lookups.append('{}__{}'.format(search_field[1:], self.prefix_lookups[search_field[0]]))
+            else:
+                text_fields.append(search_field)
+        return lookups, text_fields
+
+    def get_terms(self, search_term):  # type: (Text) -> List[Text]
+        return search_term.split()
+
+    def match_fields(self, text_fields, term):  # type: (List[Text], Text) -> Q
+        return reduce(operator.or_, [Q(**{'{}__{}'.format(field, self.default_lookup): term}) for field in text_fields])
+
+    def get_term_filter(self, lookups, text_fields, term):  # type: (List[Text], List[Text], Text) -> Q
+        """Return a filter matching the term in any of the prefixed field lookups or the fields without prefix."""
+        queries = [Q(**{lookup: term}) for lookup in lookups]
+        if text_fields:
+            queries.append(self.match_fields(text_fields, term))
+        return reduce(operator.or_, queries)
+
+    def get_filters(self, search_fields, search_term):  # type: (Sequence[Text], Text) -> List[Q]
+        """Return one filter per search term, every filter matches the term in any of the search fields."""
+        lookups, text_fields = self.split_fields(search_fields)
+        return [self.get_term_filter(lookups, text_fields, term) for term in self.get_terms(search_term)]
+
+    def prepare_queryset(self, queryset, text_fields):  # type: (QuerySet, List[Text]) -> QuerySet
+        """Add annotations used by `match_fields` to a queryset which is filtered by the given fields."""
+        return queryset
+
+    def search(self, queryset, search_fields, search_term):  # type: (QuerySet, Sequence[Text], Text) -> QuerySet
+        """
+        Filter the queryset by all search terms in a single `WHERE`.
+
+        Chaining one `filter()` per term would join multi-valued relations (many-to-many, reverse foreign keys)
+        once per term and return an object once per matching related row. Fields across such relations are matched
+        in a subquery of primary keys for each term instead, so neither the extra joins nor `DISTINCT` are needed.
+        """
+        if not search_fields or not search_term:
+            return queryset
+        if not self.multi_valued_subqueries:
+            queryset = self.prepare_queryset(queryset, self.split_fields(search_fields)[1])
+            for fltr in self.get_filters(search_fields, search_term):
+                queryset = queryset.filter(fltr)
+            return queryset
+
+        model = queryset.model
+        lookups, text_fields = self.split_fields(search_fields)
+        multi_lookups = [lookup for lookup in lookups if lookup_spawns_duplicates(model, lookup)]
+        multi_text_fields = [field for field in text_fields if lookup_spawns_duplicates(model, field)]
+        lookups = [lookup for lookup in lookups if lookup not in multi_lookups]
+        text_fields = [field for field in text_fields if field not in multi_text_fields]
+
+        queryset = self.prepare_queryset(queryset, text_fields)
+        if multi_lookups or multi_text_fields:
+            related = self.prepare_queryset(model._default_manager.order_by(), multi_text_fields)
+        filters = []
+        for term in self.get_terms(search_term):
+            queries = []
+            if lookups or text_fields:
+                queries.append(self.get_term_filter(lookups, text_fields, term))
+            if multi_lookups or multi_text_fields:
+                matching = related.filter(self.get_term_filter(multi_lookups, multi_text_fields, term))
+                queries.append(Q(pk__in=matching.values('pk')))
+            filters.append(reduce(operator.or_, queries))
+        return queryset.filter(reduce(operator.and_, filters, Q()))
+
+
+class PostgresFullTextSearchEngine(SmartListSearchEngine):
+    """
+    Match fields without prefix with PostgreSQL full-text search and rank the results.
+
+    - `config` is the text search configuration, e.g. 'english'.
+    - `vector_field` is a `SearchVectorField` of the model covering the search fields without prefix, kept up to date
+      (e.g. by a trigger) and GIN-indexed. Without it the vector is computed from the search fields, which can use
+      a GIN expression index on the same `to_tsvector` expression only.
+    - `rank` orders the results by `SearchRank` (annotated as `search_rank`) unless the list is explicitly ordered.
+    - `search_type` is passed to `SearchQuery`, 'plain' by default, 'websearch' requires Django 3.1.
+
+    Requires `psycopg2` and `django.contrib.postgres`.
+    """
+
+    vector_annotation = 'search_vector'
+    rank_annotation = 'search_rank'
+
+    def __init__(self, config=None, vector_field=None, rank=True, search_type='plain'):
+        self.config = config
+        self.vector_field = vector_field
+        self.rank = rank
+        self.search_type = search_type
+
+    def get_search_query(self, term):
+        from django.contrib.postgres.search import SearchQuery
+
+        return SearchQuery(term, config=self.config, search_type=self.search_type)
+
+    def get_vector(self, text_fields):
+        from django.contrib.postgres.search import SearchVector
+
+        return SearchVector(*text_fields, config=self.config)
+
+    def match_fields(self, text_fields, term):
+        return Q(**{self.vector_field or self.vector_annotation: self.get_search_query(term)})
+
+    def prepare_queryset(self, queryset, text_fields):
+        if text_fields and not self.vector_field:
+            queryset = queryset.annotate(**{self.vector_annotation: self.get_vector(text_fields)})
+        return queryset
+
+    def search(self, queryset, search_fields, search_term):
+        from django.contrib.postgres.search import SearchRank
+
+        queryset = super(PostgresFullTextSearchEngine, self).search(queryset, search_fields, search_term)
+        vector = self.vector_field or self.vector_annotation
+        if self.rank and search_term and (self.vector_field or vector in queryset.query.annotations):
+            queryset = queryset.annotate(
+                **{self.rank_annotation: SearchRank(vector, self.get_search_query(search_term))}
+            )
+            if not queryset.query.order_by:
+                queryset = queryset.order_by('-{}'.format(self.rank_annotation), 'pk')
+        return queryset
+
+
+class TrigramSearchEngine(SmartListSearchEngine):
+    """
+    Match fields without prefix by trigram similarity, which tolerates typos and uses GIN or GiST indexes
+    with `gin_trgm_ops` / `gist_trgm_ops`.
+
+    - `word_similarity` matches terms similar to any word of the field (`trigram_word_similar`, Django 3.0+)
+      instead of to the whole field.
+    - `rank` orders the results by the similarity of the search term (annotated as `search_rank`) unless the list
+      is explicitly ordered.
+
+    Requires the `pg_trgm` extension and `django.contrib.postgres` in INSTALLED_APPS.
+    """
+
+    rank_annotation = 'search_rank'
+
+    def __init__(self, word_similarity=False, rank=True):
+        self.word_similarity = word_similarity
+        self.rank = rank
+
+    @property
+    def default_lookup(self):
+        return 'trigram_word_similar' if self.word_similarity else 'trigram_similar'
+
+    def search(self, queryset, search_fields, search_term):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        queryset = super(TrigramSearchEngine, self).search(queryset, search_fields, search_term)
+        text_fields = [
+            field
+            for field in self.split_fields(search_fields)[1]
+            if not lookup_spawns_duplicates(queryset.model, field)
+        ]
+        if self.rank and search_term and text_fields:
+            similarity = reduce(operator.add, [TrigramSimilarity(field, search_term) for field in text_fields])
+            queryset = queryset.annotate(**{self.rank_annotation: similarity})
+            if not queryset.query.order_by:
+                queryset = queryset.order_by('-{}'.format(self.rank_annotation), 'pk')
+        return queryset
+
+
+class SQLiteFTS5SearchEngine(SmartListSearchEngine):
+    """
+    Match fields without prefix with an SQLite FTS5 table, e.g. for local development.
+
+    The FTS5 table indexes the model table (`content_rowid` is the primary key) and has a column for each search
+    field without prefix, named like the field. `get_table_sql` returns statements which create such a table for
+    local fields and triggers keeping it in sync. Terms match words starting with them.
+    """
+
+    def __init__(self, table_name):  # type: (Text) -> None
+        self.table_name = table_name
+
+    @staticmethod
+    def quote(value):  # type: (Text) -> Text
+        return '"{}"'.format(value.replace('"', '""'))
+
+    def get_match_expression(self, text_fields, term):  # type: (List[Text], Text) -> Text
+        return '{{{}}} : {}*'.format(' '.join(self.quote(field) for field in text_fields), self.quote(term))
+
+    def match_fields(self, text_fields, term):
+        table = self.quote(self.table_name)
+        sql = 'SELECT rowid FROM {} WHERE {} MATCH %s'.format(table, table)
+        return Q(pk__in=RawSQL(sql, [self.get_match_expression(text_fields, term)]))
+
+    def get_table_sql(self, model, search_fields, using='default'):  # type: (type, Sequence[Text], Text) -> List[Text]
+        """Return SQL statements creating the FTS5 table and triggers which keep it in sync with the model table."""
+        quote_name = connections[using].ops.quote_name
+        columns = []
+        for field_name in self.split_fields(search_fields)[1]:
+            try:
+                field = model._meta.get_field(field_name)
+            except FieldDoesNotExist:
+                field = None
+            if field is None or field.is_relation or not field.concrete:
+                raise SmartListException(
+                    'SQLiteFTS5SearchEngine indexes local fields only, {} is not one'.format(field_name)
+                )
+            columns.append((self.quote(field_name), quote_name(field.column)))
+
+        table, content = self.quote(self.table_name), quote_name(model._meta.db_table)
+        pk = quote_name(model._meta.pk.column)
+        fts_columns = ', '.join(name for name, column in columns)
+        names = ', '.join(['rowid'] + [name for name, column in columns])
+
+        def values(row):
+            return ', '.join(['{}.{}'.format(row, pk)] + ['{}.{}'.format(row, column) for name, column in columns])
+
+        delete = 'INSERT INTO {table}({table}, {names}) VALUES (\'delete\', {old});'
+        insert = 'INSERT INTO {table}({names}) VALUES ({new});'
+        trigger = 'CREATE TRIGGER {name} AFTER {event} ON {content} BEGIN {body} END'
+        context = {'table': table, 'names': names, 'old': values('old'), 'new': values('new')}
+        return [
+            'CREATE VIRTUAL TABLE {} USING fts5({}, content={}, content_rowid={})'.format(
+                table, fts_columns, content, pk
+            ),
+            trigger.format(
+                name=self.quote(self.table_name + '_ai'), event='INSERT', content=content, body=insert.format(**context)
+            ),
+            trigger.format(
+                name=self.quote(self.table_name + '_ad'), event='DELETE', content=content, body=delete.format(**context)
+            ),
+            trigger.format(
+                name=self.quote(self.table_name + '_au'),
+                event='UPDATE',
+                content=content,
+                body=delete.format(**context) + ' ' + insert.format(**context),
+            ),
+            'INSERT INTO {table}({table}) VALUES (\'rebuild\')'.format(table=table),
+        ]
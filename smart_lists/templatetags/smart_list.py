@@ -1,13 +1,49 @@
+from numbers import Number
+
+import six
 from django import template
+from django.core.cache import caches
+from django.utils.safestring import mark_safe
 from six.moves.urllib_parse import urlencode
 
+from smart_lists.cache import CACHE_ALIAS, is_visitor_specific
 from smart_lists.helpers import SmartList
 
 register = template.Library()
 
+SMART_LIST_TEMPLATE = 'smart_lists/smart_list.html'
+
+
+@register.simple_tag(takes_context=True)
+def smart_list(context, *args, **kwargs):
+    """
+    Display the headers and data list together, see `get_smart_list_context` for the arguments.
+
+    The output is cached if the view sets `smart_list_cache_timeout` and all arguments are plain values, so that
+    a cached list runs no queries for its rows and filters and is not rendered again. Lists rendered with the CSRF
+    token of the visitor are not cached.
+    """
+    view = context.get('view')
+    cache_key = None
+    if getattr(view, 'smart_list_cache_timeout', None) is not None:
+        arguments = list(args) + list(kwargs.values())
+        if all(isinstance(argument, (six.string_types, Number, type(None))) for argument in arguments):
+            cache_key = view.get_cache_key('smart_list', args, sorted(kwargs.items()))
+            output = caches[CACHE_ALIAS].get(cache_key)
+            if output is not None:
+                return mark_safe(output)
+
+    new_context = context.new(get_smart_list_context(context, *args, **kwargs))
+    csrf_token = context.get('csrf_token')
+    if csrf_token is not None:
+        new_context['csrf_token'] = csrf_token
+    output = context.template.engine.get_template(SMART_LIST_TEMPLATE).render(new_context)
+    if cache_key is not None and not is_visitor_specific(context.get('request')):
+        caches[CACHE_ALIAS].set(cache_key, str(output), view.smart_list_cache_timeout)
+    return output
 
-@register.inclusion_tag("smart_lists/smart_list.html", takes_context=True)
-def smart_list(
+
+def get_smart_list_context(
     context,
     object_list=None,
     page_obj=None,
@@ -23,12 +59,19 @@ def smart_list(
     grid_size=12,
     table_class='table-striped',
     table_link_class='font-weight-bold',
+    fast_table_rendering=None,
 ):
     """
-    Display the headers and data list together.
+    Build the context of the smart list template.
 
     TODO: Do pagination inside here??
     """
+    smart_list_instance = None
+    list_arguments = (object_list, query_params, list_display, list_filter, list_search)
+    if all(argument is None for argument in list_arguments + (search_query_param, ordering_query_param)):
+        # the view may have built the list, e.g. AsyncSmartListMixin which runs its queries concurrently
+        smart_list_instance = context.get('smart_list_settings', {}).get('smart_list')
+
     if object_list is None:
         object_list = context['object_list']
     if page_obj is None:
@@ -52,17 +95,20 @@ def smart_list(
         ordering_query_param = context.get('smart_list_settings', {}).get('ordering_query_param', 'o')
     if exports is None:
         exports = context.get('smart_list_settings', {}).get('exports', [])
+    if fast_table_rendering is None:
+        fast_table_rendering = context.get('smart_list_settings', {}).get('fast_table_rendering', False)
 
-    smart_list_instance = SmartList(
-        object_list,
-        query_params=query_params,
-        list_display=list_display,
-        list_filter=list_filter,
-        list_search=list_search,
-        search_query_param=search_query_param,
-        ordering_query_param=ordering_query_param,
-        view=context['view'],
-    )
+    if smart_list_instance is None:
+        smart_list_instance = SmartList(
+            object_list,
+            query_params=query_params,
+            list_display=list_display,
+            list_filter=list_filter,
+            list_search=list_search,
+            search_query_param=search_query_param,
+            ordering_query_param=ordering_query_param,
+            view=context['view'],
+        )
 
     split_grid_small_size = int(round(grid_size * 0.25))
     return {
@@ -77,6 +123,7 @@ def smart_list(
         'table_link_class': table_link_class,
         'query_params': query_params,
         'exports': exports,
+        'table_rows': smart_list_instance.render_rows(context, table_link_class) if fast_table_rendering else None,
         'extra': context.get('extra', {}),
     }
 
@@ -1,21 +1,66 @@
+import asyncio
 import datetime
+import gzip
+import json
+import os
+import pickle
+import re
+import tempfile
+from concurrent.futures import Future
+from unittest import mock
 
 import pytz
 from openpyxl import load_workbook
+import six
 from six import BytesIO
 
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import connection
+from django.http import Http404
+from django.template import Context
+from django.template.loader import get_template
+from django.test import Client
 from django.test import RequestFactory
 from django.test import TestCase
+from django.test import override_settings
 from django.utils.safestring import SafeText
 from django.views.generic import ListView
 from django.db.models import F, Q
+from django.db.models.functions import Upper
 
+from smart_lists import helpers
+from smart_lists.cache import get_models_version
+from smart_lists.async_mixins import AsyncSmartListMixin
 from smart_lists.exceptions import SmartListException
-from smart_lists.exports import SmartListExcelExportBackend, SmartListExportBackend
+from smart_lists.exports import (
+    SmartListCSVExportBackend,
+    SmartListExcelExportBackend,
+    SmartListJSONLinesExportBackend,
+    SmartListExportBackend,
+    SmartListStreamingExcelExportBackend,
+)
 from smart_lists.filters import SmartListFilter
-from smart_lists.helpers import SmartList, SmartOrder
+from smart_lists.helpers import (
+    SmartList,
+    SmartOrder,
+    clear_column_specs_cache,
+    get_column_specs,
+    get_related_lookups,
+    render_column_template,
+    resolve_ordering,
+)
+from smart_lists.jobs import ExportJobRunner, delete_expired_export_files
 from smart_lists.mixins import SmartListMixin
+from smart_lists.pagination import SmartListPaginator
+from smart_lists.search import SmartListSearchEngine, SQLiteFTS5SearchEngine, lookup_spawns_duplicates
 from testproject.models import SampleModel, ForeignModelWithUrl, ForeignModelWithoutUrl
+from testproject.views import TestListView
 
 
 class SmartListTestCase(TestCase):
@@ -77,6 +122,64 @@ class SmartListTestCase(TestCase):
         view = SampleModelListView(request=request)
         self.assertRaises(SmartListException, view.get_ordering)
 
+    def test_ordering_resolver(self):
+        def upper_title(obj):
+            return SafeText(obj.title.upper())
+
+        upper_title.admin_order_field = Upper('title')
+
+        class SampleModelListView(SmartListMixin, ListView):
+            model = SampleModel
+            list_display = ('title', 'category', (upper_title, 'Upper title'), 'friendly_category', 'some_date')
+
+        def get_ordering(query_order, **attributes):
+            view = SampleModelListView(request=self.factory.get('/smart-lists/', {'o': query_order}), **attributes)
+            return view.get_ordering()
+
+        self.assertEqual(get_ordering('3.-4'), [Upper('title').asc(), '-category'])
+        self.assertEqual(get_ordering('-3'), [Upper('title').desc()])
+        self.assertEqual(get_ordering('1.-1.2'), ['title', 'category'])
+        self.assertEqual(
+            get_ordering('-5.1', ordering_nulls_last=True),
+            [F('some_date').desc(nulls_last=True), F('title').asc(nulls_last=True)],
+        )
+        for query_order in ('0', '--1', '6', '1.', '\u00b2', '1.2.3.4.5.1', '1' + '.1' * 10000):
+            self.assertRaises(SmartListException, get_ordering, query_order)
+        self.assertRaises(SmartListException, get_ordering, '1.2.3', ordering_max_terms=2)
+
+        SampleModel.objects.create(title='a')
+        view = SampleModelListView(request=self.factory.get('/smart-lists/', {'o': '-3'}))
+        self.assertEqual([obj.title for obj in view.get_queryset()], ['I just love django-smart-lists!', 'a'])
+
+    def test_column_specs_are_cached(self):
+        list_display = ('title', ('category', 'Custom label'), 'friendly_category')
+        specs = get_column_specs(SampleModel, list_display)
+        self.assertIs(get_column_specs(SampleModel, list_display), specs)
+        self.assertEqual([spec.order_field for spec in specs], ['title', 'category', 'category'])
+
+        request = self.factory.get('/smart-lists/?o=-2')
+        smart_list = SmartList(
+            SampleModel.objects.all(), list_display=list_display, query_params=request.GET, ordering_query_param='o'
+        )
+        self.assertEqual([column.spec for column in smart_list.columns], list(specs))
+        self.assertEqual(smart_list.columns[1].get_title(), 'Custom label')
+        self.assertTrue(smart_list.columns[1].order.is_reverse())
+
+        clear_column_specs_cache()
+        self.assertIsNot(get_column_specs(SampleModel, list_display), specs)
+
+        # list_display built with new callables for every request
+        cache_size = len(helpers._column_specs_cache)
+        for i in range(10):
+            get_column_specs(SampleModel, ('title', (lambda obj: SafeText(''), 'Empty')), view_class=TestListView)
+        self.assertEqual(len(helpers._column_specs_cache), cache_size + 1)
+
+        cache_size = len(helpers._ordering_tables_cache)
+        for i in range(10):
+            list_display = ('title', (lambda obj: SafeText(''), 'Empty'))
+            self.assertEqual(resolve_ordering(SampleModel, list_display, '-1', view_class=TestListView), ['-title'])
+        self.assertEqual(len(helpers._ordering_tables_cache), cache_size + 1)
+
     def test_smart_order(self):
         so = SmartOrder({'o': '1.2'}, 1, 'o')
         self.assertEqual(so.is_ordered(), True)
@@ -96,6 +199,72 @@ class SmartListTestCase(TestCase):
         self.assertEqual(so.is_reverse(), False)
         self.assertEqual(so.get_add_sort_by(), '?o=-1')
 
+    def test_sort_and_filter_urls(self):
+        request = self.factory.get('/smart-lists/?page=2&o=-2.1&q=x&category=foo&x=a&x=b')
+        smart_list = SmartList(
+            SampleModel.objects.all(),
+            list_display=('title', 'category', 'friendly_category', 'some_display_method'),
+            list_filter=('category',),
+            query_params=request.GET,
+            ordering_query_param='o',
+        )
+        orders = [column.order for column in smart_list.columns]
+        self.assertEqual(orders[3], None)
+        self.assertTrue(all(order.ordering is smart_list.ordering for order in orders[:3]))
+        urls = [
+            (order.get_add_sort_by(), order.get_reverse_sort_by(), order.get_remove_sort_by()) for order in orders[:2]
+        ]
+        self.assertEqual(
+            urls,
+            [
+                (
+                    '?page=2&o=1.-2&q=x&category=foo&x=a',
+                    '?page=2&o=-2.-1&q=x&category=foo&x=a',
+                    '?page=2&o=-2&q=x&category=foo&x=a',
+                ),
+                (
+                    '?page=2&o=2.1&q=x&category=foo&x=a',
+                    '?page=2&o=2.1&q=x&category=foo&x=a',
+                    '?page=2&o=1&q=x&category=foo&x=a',
+                ),
+            ],
+        )
+        self.assertEqual(orders[2].get_add_sort_by(), '?page=2&o=3.-2.1&q=x&category=foo&x=a')
+
+        for value in smart_list.filters[0].get_values():
+            self.assertEqual(
+                value.get_url(), value.get_url_with_query_params({'category': value.value}, without=['page'])
+            )
+        self.assertEqual(smart_list.filters[0].get_values()[0].get_url(), '?o=-2.1&q=x&x=a')
+
+        smart_list = SmartList(
+            SampleModel.objects.all(), list_display=('title',), query_params={}, ordering_query_param='o'
+        )
+        self.assertEqual(smart_list.columns[0].order.get_add_sort_by(), '?o=1')
+
+    def test_column_accessors(self):
+        smart_list = SmartList(
+            SampleModel.objects.annotate(upper_title=Upper('title')),
+            list_display=('title', 'category', 'friendly_category', 'upper_title', '__str__', 'foreign_1'),
+        )
+        self.assertEqual(
+            [field.get_value() for field in smart_list.items[0].fields()],
+            [
+                'I just love django-smart-lists!',
+                'Blog Post',
+                'Blog Post',
+                'I JUST LOVE DJANGO-SMART-LISTS!',
+                str(self.sample),
+                None,
+            ],
+        )
+
+        smart_list = SmartList(SampleModel.objects.values('title', 'category'), list_display=('title', 'category'))
+        self.assertEqual(
+            [field.get_value() for field in smart_list.items[0].fields()],
+            ['I just love django-smart-lists!', 'blog_post'],
+        )
+
     def test_get_verbose_column_title_with_fallback(self):
         smart_list = SmartList(SampleModel.objects.all(), **{'list_display': ('category',)})
         self.assertEqual('Category', smart_list.columns[0].get_title())
@@ -125,6 +294,73 @@ class SmartListTestCase(TestCase):
         self.assertEqual(2, len(view.get_queryset()))
         self.assertEqual([foobar, bar], list(view.get_queryset()))
 
+    def test_search_across_multi_valued_relation(self):
+        fruit = ForeignModelWithUrl.objects.create(title='fruit')
+        other = ForeignModelWithUrl.objects.create(title='apple')
+        SampleModel.objects.create(title='apple pie', foreign_1=fruit)
+        SampleModel.objects.create(title='apple tart', foreign_1=fruit)
+        SampleModel.objects.create(title='banana', foreign_1=fruit)
+        SampleModel.objects.create(title='cherry', foreign_1=other)
+
+        self.assertTrue(lookup_spawns_duplicates(ForeignModelWithUrl, 'samplemodel__title__istartswith'))
+        self.assertFalse(lookup_spawns_duplicates(SampleModel, 'foreign_1__title'))
+
+        class ForeignModelListView(SmartListMixin, ListView):
+            model = ForeignModelWithUrl
+            list_display = ('title',)
+            search_fields = ('title', '^samplemodel__title')
+            ordering = ['pk']
+
+        def search(view_class, term):
+            return view_class(request=self.factory.get('/smart-lists/', {'q': term})).get_queryset()
+
+        qs = search(ForeignModelListView, 'apple banana')
+        self.assertEqual(list(qs), [fruit])
+        self.assertNotIn('DISTINCT', str(qs.query))
+        self.assertEqual(list(search(ForeignModelListView, 'apple')), [fruit, other])
+        self.assertEqual(list(search(ForeignModelListView, 'apple cherry')), [other])
+        self.assertEqual(list(search(ForeignModelListView, 'banana cherry')), [])
+
+        class ChainedSearchEngine(SmartListSearchEngine):
+            multi_valued_subqueries = False
+
+        class ChainedListView(ForeignModelListView):
+            search_engine = ChainedSearchEngine()
+
+        self.assertEqual(list(search(ChainedListView, 'apple banana')), [fruit, fruit])
+
+    def test_sqlite_fts5_search_engine(self):
+        engine = SQLiteFTS5SearchEngine('testproject_samplemodel_fts')
+        with connection.cursor() as cursor:
+            for sql in engine.get_table_sql(SampleModel, ('title', '^category')):
+                cursor.execute(sql)
+        first = SampleModel.objects.create(title='Quick brown fox', category='foo')
+        second = SampleModel.objects.create(title='Lazy dog', category='bar')
+        third = SampleModel.objects.create(title='Brown "dog"', category='blog_post')
+
+        class SampleModelListView(SmartListMixin, ListView):
+            model = SampleModel
+            list_display = ('title', 'category')
+            search_fields = ('title', '^category')
+            search_engine = engine
+            ordering = ['pk']
+
+        def search(term):
+            return list(SampleModelListView(request=self.factory.get('/smart-lists/', {'q': term})).get_queryset())
+
+        self.assertEqual(search('bro'), [first, third])
+        self.assertEqual(search('brown dog'), [third])
+        self.assertEqual(search('"dog"'), [second, third])  # quotes are not FTS5 syntax
+        self.assertEqual(search('blog'), [self.sample, third])
+        second.title = 'Lazy brown dog'
+        second.save()
+        self.assertEqual(search('brown dog'), [second, third])
+        third.delete()
+        self.assertEqual(search('dog'), [second])
+
+        with self.assertRaises(SmartListException):
+            engine.get_table_sql(SampleModel, ('foreign_1__title',))
+
     def test_custom_filter_classes_parsing(self):
         class BlogOrNotFilter(SmartListFilter):
             parameter_name = 'blog'
@@ -225,6 +461,63 @@ class SmartListTestCase(TestCase):
 
         self.assertEqual(render_column_function(SampleModel.objects.last()), smart_list_item_field_with_custom_render)
 
+    def test_column_template(self):
+        SampleModel.objects.create(title='<b>test</b>', category='foo')
+        with mock.patch('django.template.loader.get_template', wraps=get_template) as mocked_get_template:
+            render_function = render_column_template('testproject/example_column_template.html')
+            bulk_render_function = render_column_template('testproject/example_column_template.html', bulk=True)
+            smart_list = SmartList(
+                SampleModel.objects.all(),
+                list_display=('title', (render_function, 'Template'), (bulk_render_function, 'Bulk template')),
+            )
+            values = [[field.get_value() for field in item.fields()] for item in smart_list.items]
+            values += [[field.get_value() for field in item.fields()] for item in smart_list.items]
+        self.assertEqual(mocked_get_template.call_count, 2)
+        self.assertEqual(values[0], ['I just love django-smart-lists!', 'BLOG POST\n', 'BLOG POST\n'])
+        self.assertEqual(values[1], ['<b>test</b>', 'FOO\n', 'FOO\n'])
+        self.assertIsInstance(values[1][2], SafeText)
+
+    def test_bulk_render_function(self):
+        SampleModel.objects.create(title='test', category='foo')
+        calls = []
+
+        def render_function(obj):
+            calls.append(obj)
+            return SafeText('single {}'.format(obj.pk))
+
+        render_function.render_bulk = lambda objects: [SafeText('bulk {}'.format(obj.pk)) for obj in objects]
+
+        smart_list = SmartList(SampleModel.objects.all(), list_display=((render_function, 'Bulk'),))
+        self.assertEqual([item.fields()[0].get_value() for item in smart_list.items], ['bulk 1', 'bulk 2'])
+        self.assertEqual(calls, [])
+
+        smart_list = SmartList(SampleModel.objects.all(), list_display=((render_function, 'Bulk'),))
+        rows = smart_list.render_rows(Context())
+        self.assertIn('bulk 1', rows)
+        self.assertIn('bulk 2', rows)
+        self.assertEqual(calls, [])
+
+        render_function.render_bulk = lambda objects: ['<b>bulk</b>' for obj in objects]
+        smart_list = SmartList(SampleModel.objects.all(), list_display=((render_function, 'Bulk'),))
+        with self.assertRaises(SmartListException):
+            smart_list.items
+
+    def test_bulk_column_template_autoescape(self):
+        SampleModel.objects.create(title='<b>test</b>', category='foo')
+        templates = [dict(settings.TEMPLATES[0], OPTIONS={'autoescape': False})]
+        for autoescape_templates in (settings.TEMPLATES, templates):
+            with override_settings(TEMPLATES=autoescape_templates):
+                smart_list = SmartList(
+                    SampleModel.objects.all(),
+                    list_display=[
+                        (render_column_template('testproject/title_column_template.html', bulk=bulk), 'Title')
+                        for bulk in (False, True)
+                    ],
+                )
+                values = [[field.get_value() for field in item.fields()] for item in smart_list.items]
+            self.assertEqual(values[-1][0], values[-1][1])
+        self.assertEqual(values[-1], ['<b>test</b>\n', '<b>test</b>\n'])
+
     def test_has_link(self):
         foreign_1 = ForeignModelWithUrl.objects.create(title='foreign test')
         foreign_2 = ForeignModelWithoutUrl.objects.create(title='foreign test')
@@ -244,6 +537,632 @@ class SmartListTestCase(TestCase):
         test_2_item = smart_list.items[-1]
         self.assertFalse(test_2_item.fields()[1].has_link())
 
+    def test_related_lookups(self):
+        class SampleModelListView(SmartListMixin, ListView):
+            model = SampleModel
+            list_display = ('title', 'foreign_1', 'foreign_2')
+
+        foreign_1 = ForeignModelWithUrl.objects.create(title='foreign test')
+        foreign_2 = ForeignModelWithoutUrl.objects.create(title='foreign test')
+        for i in range(3):
+            SampleModel.objects.create(title='test', foreign_1=foreign_1, foreign_2=foreign_2)
+
+        view = SampleModelListView(request=self.factory.get('/smart-lists/'))
+        self.assertEqual(view.get_related_lookups(SampleModel), (['foreign_1', 'foreign_2'], []))
+        smart_list = SmartList(view.get_queryset(), list_display=view.list_display)
+        with self.assertNumQueries(1):
+            values = [[field.get_value() for field in item.fields()] for item in smart_list.items]
+        self.assertEqual(values[-1], ['test', foreign_1, foreign_2])
+
+        SampleModelListView.auto_related_lookups = False
+        view = SampleModelListView(request=self.factory.get('/smart-lists/'))
+        self.assertEqual(view.get_queryset().query.select_related, False)
+
+    def test_related_lookups_for_restricted_querysets(self):
+        foreign_1 = ForeignModelWithUrl.objects.create(title='foreign test')
+        SampleModel.objects.create(title='test', foreign_1=foreign_1)
+
+        class SampleModelListView(SmartListMixin, ListView):
+            list_display = ('title', 'foreign_1')
+
+        SampleModelListView.queryset = SampleModel.objects.filter(pk=1).union(SampleModel.objects.filter(pk=2))
+        response = SampleModelListView.as_view()(self.factory.get('/smart-lists/'))
+        self.assertContains(response.render(), 'foreign test', count=1)
+
+        SampleModelListView.queryset = SampleModel.objects.only('title')
+        view = SampleModelListView(request=self.factory.get('/smart-lists/'))
+        self.assertEqual(view.get_queryset().query.select_related, False)
+        response = SampleModelListView.as_view()(self.factory.get('/smart-lists/'))
+        self.assertContains(response.render(), 'foreign test', count=1)
+
+        SampleModelListView.queryset = SampleModel.objects.defer('foreign_1__title')
+        view = SampleModelListView(request=self.factory.get('/smart-lists/'))
+        self.assertEqual(view.get_queryset().query.select_related, {'foreign_1': {}})
+
+    def test_related_lookups_for_related_paths(self):
+        self.assertEqual(
+            get_related_lookups(SampleModel, ['title', 'foreign_1__title', 'foreign_2', 'foreign_2__title']),
+            (['foreign_1', 'foreign_2'], []),
+        )
+        self.assertEqual(get_related_lookups(ForeignModelWithUrl, ['samplemodel__title']), ([], ['samplemodel']))
+
+    def test_projection(self):
+        foreign_1 = ForeignModelWithUrl.objects.create(title='foreign test')
+        SampleModel.objects.create(title='test', category='blog_post', foreign_1=foreign_1)
+
+        class SampleModelListView(SmartListMixin, ListView):
+            model = SampleModel
+            projection = True
+            list_display = ('title', 'category', 'foreign_1')
+
+        view = SampleModelListView(request=self.factory.get('/smart-lists/'))
+        qs = view.get_queryset()
+        self.assertEqual(qs.query.deferred_loading, ({'title', 'category', 'foreign_1'}, False))
+        obj = qs.last()
+        with self.assertNumQueries(0):
+            self.assertEqual((obj.title, obj.get_category_display(), obj.foreign_1), ('test', 'Blog Post', foreign_1))
+
+        def render_title(obj):
+            return SafeText(obj.foreign_1.title)
+
+        SampleModelListView.list_display = ('category', (render_title, 'Foreign'))
+        view = SampleModelListView(request=self.factory.get('/smart-lists/'))
+        self.assertEqual(view.get_queryset().query.deferred_loading, (frozenset(), True))
+
+        render_title.required_fields = ('foreign_1__title',)
+        view = SampleModelListView(request=self.factory.get('/smart-lists/'))
+        qs = view.get_queryset()
+        self.assertEqual(qs.query.deferred_loading, ({'category', 'foreign_1', 'foreign_1__title'}, False))
+        self.assertEqual(qs.query.select_related, {'foreign_1': {}})
+        with self.assertNumQueries(1):
+            self.assertEqual(render_title(qs.last()), 'foreign test')
+
+    def test_projection_to_values(self):
+        ForeignModelWithoutUrl.objects.create(title='foreign test')
+
+        class ForeignModelListView(SmartListMixin, ListView):
+            model = ForeignModelWithoutUrl
+            projection = True
+            list_display = ('title',)
+
+        view = ForeignModelListView(request=self.factory.get('/smart-lists/'))
+        self.assertEqual(list(view.get_queryset()), [{'title': 'foreign test'}])
+
+    def test_keyset_pagination(self):
+        for i, category in enumerate(['foo', 'bar', 'foo', 'bar', 'foo', 'blog_post', 'bar']):
+            some_date = datetime.date(2020, 1, i + 1) if i % 3 else None
+            SampleModel.objects.create(title='title {}'.format(i), category=category, some_date=some_date)
+
+        class SampleModelListView(SmartListMixin, ListView):
+            model = SampleModel
+            paginate_by = 3
+            keyset_pagination = True
+            list_display = ('title', 'category', 'some_date')
+
+        for ordering, expected in [
+            ('-2', SampleModel.objects.order_by('-category', '-pk')),
+            ('3.1', SampleModel.objects.order_by('some_date', 'title', 'pk')),
+            ('-3', SampleModel.objects.order_by('-some_date', '-pk')),
+        ]:
+            expected = list(expected)
+            pages = []
+            url = '?o={}'.format(ordering)
+            while url:
+                response = SampleModelListView.as_view()(request=self.factory.get('/smart-lists/' + url))
+                page = response.context_data['page_obj']
+                self.assertTrue(response.context_data['is_paginated'])
+                self.assertLessEqual(len(page), 3)
+                pages.append(list(page.object_list))
+                url = page.get_next_url()
+            self.assertEqual(sum(pages, []), expected)
+            self.assertEqual(len(pages), 3)
+
+            url = page.get_previous_url()
+            previous_pages = [pages[-1]]
+            while url:
+                response = SampleModelListView.as_view()(request=self.factory.get('/smart-lists/' + url))
+                page = response.context_data['page_obj']
+                previous_pages.insert(0, list(page.object_list))
+                url = page.get_previous_url()
+            self.assertEqual(previous_pages, pages)
+
+        with self.assertRaises(Http404):
+            SampleModelListView.as_view()(request=self.factory.get('/smart-lists/?cursor=foo'))
+
+        class ProjectedListView(SmartListMixin, ListView):
+            model = ForeignModelWithoutUrl
+            paginate_by = 2
+            keyset_pagination = True
+            projection = True
+            list_display = ('title',)
+
+        for i in range(3):
+            ForeignModelWithoutUrl.objects.create(title='title {}'.format(i % 2))
+        response = ProjectedListView.as_view()(request=self.factory.get('/smart-lists/?o=1'))
+        url = response.context_data['page_obj'].get_next_url()
+        response = ProjectedListView.as_view()(request=self.factory.get('/smart-lists/' + url))
+        self.assertEqual([obj.title for obj in response.context_data['page_obj'].object_list], ['title 1'])
+
+        # .values() rows without the ordering fields are paginated with offsets
+        ProjectedListView.template_name = 'testproject/samplemodel_list.html'
+        ProjectedListView.queryset = ForeignModelWithoutUrl.objects.values('title')
+        response = ProjectedListView.as_view()(request=self.factory.get('/smart-lists/?o=1&page=2'))
+        self.assertContains(response.render(), 'title 1', count=1)
+        self.assertEqual(response.context_data['page_obj'].number, 2)
+        ProjectedListView.queryset = ForeignModelWithoutUrl.objects.values('id', 'title')
+        response = ProjectedListView.as_view()(request=self.factory.get('/smart-lists/?o=1'))
+        self.assertContains(response.render(), 'title 0', count=2)
+        self.assertTrue(response.context_data['paginator'].keyset)
+
+        # orderings keyset pagination doesn't support are paginated with offsets
+        with mock.patch.object(SampleModelListView, 'ordering_nulls_last', True):
+            response = SampleModelListView.as_view()(request=self.factory.get('/smart-lists/?o=-3&page=2'))
+        self.assertEqual(
+            list(response.context_data['page_obj'].object_list),
+            list(SampleModel.objects.order_by(F('some_date').desc(nulls_last=True))[3:6]),
+        )
+
+    def test_paginator_count_cache(self):
+        caches['default'].clear()
+        qs = SampleModel.objects.filter(category='blog_post').order_by('pk')
+        self.assertEqual(SmartListPaginator(qs, 10, count_cache_timeout=60).count, 1)
+        SampleModel.objects.create(title='test', category='blog_post')
+        with self.assertNumQueries(0):
+            self.assertEqual(SmartListPaginator(qs, 10, count_cache_timeout=60).count, 1)
+        self.assertEqual(SmartListPaginator(qs.filter(title='test'), 10, count_cache_timeout=60).count, 1)
+        self.assertEqual(SmartListPaginator(qs, 10).count, 2)
+
+    def test_paginator_estimated_count(self):
+        class EstimatingPaginator(SmartListPaginator):
+            def get_estimated_count(self):
+                return 1000
+
+        qs = SampleModel.objects.order_by('pk')
+        self.assertEqual(EstimatingPaginator(qs, 10, estimate_count_threshold=500).count, 1000)
+        self.assertEqual(EstimatingPaginator(qs, 10, estimate_count_threshold=5000).count, 1)
+        # estimates are only available on PostgreSQL
+        self.assertEqual(SmartListPaginator(qs, 10, estimate_count_threshold=0).count, 1)
+
+    def test_paginator_page_window(self):
+        paginator = SmartListPaginator(list(range(200)), 10)
+        self.assertEqual(paginator.get_page_window(1), [1, 2, 3, 4, None, 19, 20])
+        self.assertEqual(paginator.get_page_window(10), [1, 2, None, 7, 8, 9, 10, 11, 12, 13, None, 19, 20])
+        self.assertEqual(paginator.page(20).page_window, [1, 2, None, 17, 18, 19, 20])
+        self.assertEqual(SmartListPaginator(list(range(50)), 10).page(1).page_window, [1, 2, 3, 4, 5])
+
+    def test_field_values_are_computed_once(self):
+        foreign_1 = ForeignModelWithUrl.objects.create(title='foreign test')
+        SampleModel.objects.create(title='test', foreign_1=foreign_1)
+        calls = []
+
+        def get_foreign(obj):
+            calls.append(obj)
+            return obj.foreign_1
+
+        SampleModel.get_foreign = get_foreign
+        try:
+            smart_list = SmartList(SampleModel.objects.filter(title='test'), list_display=('title', 'get_foreign'))
+            item = smart_list.items[0]
+            field = item.fields()[1]
+            for i in range(3):
+                self.assertTrue(field.has_link())
+                self.assertEqual(field.get_absolute_url(), foreign_1.get_absolute_url())
+                self.assertEqual(field.get_value(), foreign_1)
+            self.assertEqual(len(calls), 1)
+            self.assertIs(item.fields()[1], field)
+        finally:
+            del SampleModel.get_foreign
+
+    def test_foreign_key_filter_values(self):
+        first = ForeignModelWithUrl.objects.create(title='first')
+        second = ForeignModelWithUrl.objects.create(title='second')
+        ForeignModelWithUrl.objects.create(title='unused')
+        SampleModel.objects.create(title='test', foreign_1=second)
+        SampleModel.objects.create(title='test', foreign_1=first)
+        SampleModel.objects.create(title='other', foreign_1=second)
+
+        class SampleModelListView(SmartListMixin, ListView):
+            model = SampleModel
+            list_display = ('title', 'foreign_1')
+            list_filter = ('foreign_1',)
+
+        def get_filter(view_class, url='/smart-lists/'):
+            view = view_class(request=self.factory.get(url))
+            view.object_list = view.get_queryset()
+            smart_list = SmartList(
+                view.object_list, list_filter=view.list_filter, query_params=view.request.GET, view=view
+            )
+            return smart_list.filters[0]
+
+        fltr = get_filter(SampleModelListView)
+        with self.assertNumQueries(1):
+            values = fltr.get_values()
+        self.assertEqual([(value.get_title(), value.value) for value in values[1:]], [(first, '1'), (second, '2')])
+        self.assertFalse(fltr.too_many_values)
+
+        values = get_filter(SampleModelListView, '/smart-lists/?foreign_1=2').get_values()
+        self.assertEqual([value.value for value in values[1:]], ['2'])
+
+        class LabelListView(SampleModelListView):
+            list_filter_label_fields = {'foreign_1': 'title'}
+
+        values = get_filter(LabelListView).get_values()
+        self.assertEqual([(value.get_title(), value.value) for value in values[1:]], [('first', '1'), ('second', '2')])
+
+        class LimitedListView(SampleModelListView):
+            list_filter_max_values = 1
+
+        fltr = get_filter(LimitedListView)
+        self.assertEqual([value.get_title() for value in fltr.get_values()], ['All'])
+        self.assertTrue(fltr.too_many_values)
+
+    def test_filter_counts(self):
+        caches['default'].clear()
+        first = ForeignModelWithUrl.objects.create(title='first')
+        second = ForeignModelWithUrl.objects.create(title='second')
+        SampleModel.objects.create(title='test', category='foo', foreign_1=first)
+        SampleModel.objects.create(title='test', category='foo', foreign_1=second)
+        SampleModel.objects.create(title='test', category='bar', foreign_1=second)
+        SampleModel.objects.create(title='other', category='foo', foreign_1=second)
+
+        class SampleModelListView(SmartListMixin, ListView):
+            model = SampleModel
+            list_display = ('title', 'category', 'foreign_1')
+            list_filter = ('category', 'foreign_1')
+            search_fields = ('title',)
+            list_filter_counts = True
+            list_filter_counts_cache_timeout = 60
+
+        def get_counts(url):
+            view = SampleModelListView(request=self.factory.get(url))
+            view.object_list = view.get_queryset()
+            smart_list = SmartList(
+                view.object_list, list_filter=view.list_filter, query_params=view.request.GET, view=view
+            )
+            return [[(value.value, value.count) for value in fltr.get_values()] for fltr in smart_list.filters]
+
+        with self.assertNumQueries(3):  # values of the ForeignKey filter, choice counts, ForeignKey counts
+            counts = get_counts('/smart-lists/?q=test&category=foo')
+        self.assertEqual(
+            counts,
+            [
+                [(None, 3), ('blog_post', 0), ('foo', 2), ('bar', 1)],
+                [(None, 2), ('1', 1), ('2', 1)],
+            ],
+        )
+        with self.assertNumQueries(1):  # values of the ForeignKey filter, counts are cached
+            self.assertEqual(get_counts('/smart-lists/?q=test&category=foo'), counts)
+
+        self.assertEqual(
+            get_counts('/smart-lists/?foreign_1=2'),
+            [
+                [(None, 3), ('blog_post', 0), ('foo', 2), ('bar', 1)],
+                [(None, 5), ('2', 3)],
+            ],
+        )
+
+    def test_filter_values_cache(self):
+        caches['default'].clear()
+        first = ForeignModelWithUrl.objects.create(title='first')
+        second = ForeignModelWithUrl.objects.create(title='second')
+        SampleModel.objects.create(title='test', foreign_1=first)
+
+        class TitleFilter(SmartListFilter):
+            parameter_name = 'title'
+            title = 'Title'
+            lookups_cache_models = (ForeignModelWithUrl,)
+
+            def lookups(self):
+                return [(obj.pk, obj.title) for obj in ForeignModelWithUrl.objects.order_by('pk')]
+
+        class SampleModelListView(SmartListMixin, ListView):
+            model = SampleModel
+            list_display = ('title', 'foreign_1')
+            list_filter_cache = True
+
+            def get_list_filter(self):
+                return ('foreign_1', TitleFilter(self.request))
+
+        def get_values():
+            view = SampleModelListView(request=self.factory.get('/smart-lists/'))
+            view.object_list = view.get_queryset()
+            smart_list = SmartList(
+                view.object_list, list_filter=view.get_list_filter(), query_params=view.request.GET, view=view
+            )
+            return [
+                [(value.value, str(value.get_title())) for value in fltr.get_values()] for fltr in smart_list.filters
+            ]
+
+        values = get_values()
+        self.assertEqual(values, [[(None, 'All'), ('1', 'first')], [(None, 'All'), (1, 'first'), (2, 'second')]])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_values(), values)
+
+        SampleModel.objects.create(title='other', foreign_1=second)
+        second.title = 'changed'
+        second.save()
+        self.assertEqual(
+            get_values(),
+            [[(None, 'All'), ('1', 'first'), ('2', 'changed')], [(None, 'All'), (1, 'first'), (2, 'changed')]],
+        )
+
+    def test_smart_list_tag_cache(self):
+        caches['default'].clear()
+        with mock.patch.object(TestListView, 'smart_list_cache_timeout', 60):
+            content = self.client.get('/foreign/?o=1&q=').content
+            self.assertIn(b'I just love django-smart-lists!', content)
+            with self.assertNumQueries(1):  # the page count
+                self.assertEqual(self.client.get('/foreign/?q=&o=1').content, content)
+            self.assertNotEqual(self.client.get('/foreign/?o=-1').content, content)
+
+            self.sample.title = 'Changed'
+            self.sample.save()
+            self.assertIn(b'Changed', self.client.get('/foreign/?o=1').content)
+
+    def test_response_cache(self):
+        caches['default'].clear()
+        with mock.patch.object(TestListView, 'response_cache_timeout', 60):
+            content = self.client.get('/foreign/?o=1').content
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get('/foreign/?o=1').content, content)
+            SampleModel.objects.create(title='New one')
+            self.assertIn(b'New one', self.client.get('/foreign/?o=1').content)
+
+        with mock.patch.multiple(TestListView, response_cache_timeout=60, list_filter=('category',)):
+            # views use the last value of a parameter and filter on empty values
+            self.assertIn(b'I just love django-smart-lists!', self.client.get('/foreign/').content)
+            self.assertNotIn(b'I just love django-smart-lists!', self.client.get('/foreign/?category=').content)
+            self.assertIn(b'I just love', self.client.get('/foreign/?category=foo&category=blog_post').content)
+            self.assertNotIn(b'I just love', self.client.get('/foreign/?category=blog_post&category=foo').content)
+
+    def test_models_version(self):
+        caches['default'].clear()
+        version = get_models_version(SampleModel)
+        self.assertEqual(get_models_version(SampleModel), version)
+        self.sample.save()
+        self.assertNotEqual(get_models_version(SampleModel), version)
+
+        caches['default'].clear()
+        self.sample.save()  # a missing version is not stored by saves
+        self.assertEqual(caches['default'].get('smart_lists.version.testproject.samplemodel'), None)
+
+        with mock.patch('smart_lists.cache.caches') as mocked_caches:
+            Group.objects.create(name='not listed')
+        self.assertEqual(mocked_caches.mock_calls, [])
+
+    def test_caches_skip_csrf_token(self):
+        caches['default'].clear()
+        template_name = 'testproject/samplemodel_list_with_form.html'
+        for timeout in ('response_cache_timeout', 'smart_list_cache_timeout'):
+            with mock.patch.multiple(TestListView, template_name=template_name, **{timeout: 60}):
+                tokens = []
+                for i in range(2):
+                    client = Client(enforce_csrf_checks=True)
+                    content = client.get('/foreign/?o=1').content.decode()
+                    self.assertIn('I just love django-smart-lists!', content)
+                    tokens.append(re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', content).group(1))
+                    # the list view doesn't accept posts, after the CSRF check
+                    self.assertEqual(client.post('/foreign/', {'csrfmiddlewaretoken': tokens[-1]}).status_code, 405)
+                self.assertNotEqual(tokens[0], tokens[1])
+
+    def test_conditional_response(self):
+        self.sample.some_datetime = datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=pytz.utc)
+        self.sample.save()
+        with mock.patch.multiple(TestListView, conditional_response=True, last_modified_field='some_datetime'):
+            response = self.client.get('/foreign/?o=1')
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+            self.assertEqual(response['Last-Modified'], 'Thu, 02 Jan 2020 03:04:05 GMT')
+
+            with self.assertNumQueries(1):
+                response = self.client.get('/foreign/?o=1', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+            response = self.client.get('/foreign/?o=1', HTTP_IF_MODIFIED_SINCE='Thu, 02 Jan 2020 03:04:05 GMT')
+            self.assertEqual(response.status_code, 304)
+
+            self.assertEqual(self.client.get('/foreign/?o=-1', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+            SampleModel.objects.create(title='New one')
+            self.assertEqual(self.client.get('/foreign/?o=1', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        with mock.patch.multiple(TestListView, conditional_response=True, get_list_version=lambda view: 'v1'):
+            etag = self.client.get('/foreign/').get('ETag')
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get('/foreign/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_background_export_job(self):
+        SampleModel.objects.create(title='Second', category='foo')
+        with tempfile.TemporaryDirectory() as location, mock.patch.multiple(
+            TestListView,
+            export_backends=[SmartListCSVExportBackend('CSV', 'list.csv')],
+            export_job_runner=ExportJobRunner(),
+            export_job_storage=FileSystemStorage(location=location),
+        ):
+            response = self.client.get('/foreign/?o=1&e=0')
+            self.assertEqual(response.status_code, 202)
+            status = response.json()
+            self.assertEqual((status['state'], status['progress'], status['total']), ('done', 2, 2))
+            self.assertEqual(self.client.get(response['Location']).json()['download_url'], status['download_url'])
+
+            response = self.client.get(status['download_url'])
+            content = b''.join(response.streaming_content)
+            self.assertEqual(
+                content,
+                b'Title,Category,Foreign 1,Foreign 2\r\n'
+                b'I just love django-smart-lists!,Blog Post,None,None\r\n'
+                b'Second,Foo,None,None\r\n',
+            )
+            self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+            response = self.client.get(status['download_url'], HTTP_RANGE='bytes=6-13')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Range'], 'bytes 6-13/{}'.format(len(content)))
+            self.assertEqual(b''.join(response.streaming_content), content[6:14])
+            response = self.client.get(status['download_url'], HTTP_RANGE='bytes=-5')
+            self.assertEqual(b''.join(response.streaming_content), content[-5:])
+            self.assertEqual(self.client.get(status['download_url'], HTTP_RANGE='bytes=1000-').status_code, 416)
+
+            self.assertEqual(self.client.get('/foreign/?export_job=unknown').status_code, 404)
+
+            # the files of expired jobs are deleted
+            storage = TestListView.export_job_storage
+            old_name = storage.save('smart_lists/exports/expired/list.csv', BytesIO(b'expired'))
+            os.utime(storage.path(old_name), (0, 0))
+            out = six.StringIO()
+            call_command('smart_list_clean_exports', stdout=out, verbosity=2)
+            self.assertEqual(out.getvalue(), 'Deleted {}\nDeleted 1 expired export file(s).\n'.format(old_name))
+            self.assertFalse(storage.exists(old_name))
+            self.assertEqual(self.client.get(status['download_url']).status_code, 200)
+            caches['default'].clear()
+            self.assertEqual(delete_expired_export_files(storage), [])  # the file is recent
+            self.assertEqual(len(delete_expired_export_files(storage, max_age=-1)), 1)
+
+    def test_parallel_export(self):
+        class ImmediateExecutor(object):
+            def submit(self, fn, *args):
+                future = Future()
+                future.set_result(fn(*pickle.loads(pickle.dumps(args))))  # arguments are sent to other processes
+                return future
+
+            def shutdown(self, wait=True):
+                pass
+
+        foreign = ForeignModelWithUrl.objects.create(title='foreign')
+        for i in range(10):
+            SampleModel.objects.create(
+                title='title {}'.format(i), category=['foo', 'bar'][i % 2], foreign_1=foreign if i % 3 else None
+            )
+        sequential = SmartListCSVExportBackend('CSV', 'list.csv')
+        parallel = SmartListCSVExportBackend('CSV', 'list.csv')
+        parallel.parallel_processes = 2
+        parallel.parallel_slice_size = 3
+        progress = []
+        parallel.progress_callback = progress.append
+
+        for ordering in ['', '2', '-2.1', '3', '-3']:
+            with mock.patch.object(TestListView, 'export_backends', [sequential]):
+                expected = b''.join(self.client.get('/foreign/', {'o': ordering, 'e': 0}).streaming_content)
+            with mock.patch.object(TestListView, 'export_backends', [parallel]), mock.patch.object(
+                SmartListCSVExportBackend, 'get_executor', return_value=ImmediateExecutor()
+            ):
+                content = b''.join(self.client.get('/foreign/', {'o': ordering, 'e': 0}).streaming_content)
+            self.assertEqual(len(content.splitlines()), 12)
+            if ordering:
+                self.assertEqual(content, expected)
+            else:
+                self.assertEqual(sorted(content.splitlines()), sorted(expected.splitlines()))
+        self.assertEqual(progress[-4:], [3, 6, 9, 11])
+
+        # orderings which can't be sliced and unpicklable extra filters are exported in this process
+        parallel.progress_callback = None
+        with mock.patch.object(TestListView, 'export_backends', [parallel]), mock.patch.object(
+            SmartListCSVExportBackend, 'get_executor', side_effect=AssertionError
+        ):
+            with mock.patch.object(TestListView, 'ordering_nulls_last', True):
+                content = b''.join(self.client.get('/foreign/', {'o': '-2.1', 'e': 0}).streaming_content)
+            self.assertEqual(len(content.splitlines()), 12)
+            with mock.patch.object(parallel, 'extra_filters', lambda: Q(category='foo')):
+                content = b''.join(self.client.get('/foreign/', {'o': '1', 'e': 0}).streaming_content)
+            self.assertEqual(len(content.splitlines()), 6)
+
+    def test_async_view(self):
+        for i in range(7):
+            SampleModel.objects.create(title='title {}'.format(i), category=['foo', 'bar'][i % 2])
+
+        class AsyncTestListView(AsyncSmartListMixin, TestListView):
+            concurrent_queries = False  # the test database is not visible to other connections
+            paginate_by = 3
+            list_filter = ('category', 'foreign_1')
+            list_filter_counts = True
+
+        class SyncTestListView(TestListView):
+            paginate_by = 3
+            list_filter = ('category', 'foreign_1')
+            list_filter_counts = True
+
+        async_view = AsyncTestListView.as_view()
+        self.assertTrue(asyncio.iscoroutinefunction(async_view))
+        for params in ({}, {'page': 2, 'o': '-1'}, {'page': 'last', 'category': 'foo'}):
+            request = self.factory.get('/foreign/', params)
+            expected = SyncTestListView.as_view()(request).render().content
+            with self.assertNumQueries(5):  # count, rows, filter counts, ForeignKey filter values and counts
+                response = async_to_sync(async_view)(request)
+                response.render()
+            self.assertEqual(response.content, expected)
+
+        with self.assertRaises(Http404):
+            async_to_sync(async_view)(self.factory.get('/foreign/', {'page': 10}))
+
+        with mock.patch.object(AsyncTestListView, 'export_backends', [SmartListCSVExportBackend('CSV', 'list.csv')]):
+            response = async_to_sync(async_view)(self.factory.get('/foreign/', {'e': 0, 'o': '1'}))
+            content = b''.join(response.streaming_content)
+        self.assertEqual(
+            content.splitlines()[:2],
+            [b'Title,Category,Foreign 1,Foreign 2', b'I just love django-smart-lists!,Blog Post,None,None'],
+        )
+
+        backends = [SmartListCSVExportBackend('CSV', 'list.csv')]
+        with mock.patch.multiple(AsyncTestListView, export_backends=backends, conditional_response=True):
+            response = async_to_sync(async_view)(self.factory.get('/foreign/', {'e': 0}))
+            self.assertEqual(response.status_code, 200)
+            request = self.factory.get('/foreign/', {'e': 0}, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(async_to_sync(async_view)(request).status_code, 304)
+
+    def test_fast_table_rendering(self):
+        SampleModel.objects.create(
+            title='<b>Tom & Jerry</b>',
+            category='foo',
+            foreign_1=ForeignModelWithUrl.objects.create(title='With "url"'),
+            foreign_2=ForeignModelWithoutUrl.objects.create(title='Without <url>'),
+            some_date=datetime.date(2020, 1, 31),
+            some_datetime=datetime.datetime(2020, 1, 31, 12, 30, tzinfo=pytz.utc),
+        )
+        list_display = TestListView.list_display + [
+            'some_date',
+            'some_datetime',
+            (lambda obj: SafeText('<i>x</i>'), 'X'),
+        ]
+        with mock.patch.object(TestListView, 'list_display', list_display):
+            for params in ('o=1', 'o=-2&category=foo'):
+                expected = self.client.get('/foreign/?' + params).content
+                self.assertIn(b'&lt;b&gt;Tom &amp; Jerry&lt;/b&gt;', expected)
+                with mock.patch.object(TestListView, 'fast_table_rendering', True):
+                    self.assertEqual(self.client.get('/foreign/?' + params).content, expected)
+
+    def test_index_advisor(self):
+        out = six.StringIO()
+        with mock.patch.object(TestListView, 'search_fields', ('title', '=category', 'foreign_1__title')):
+            call_command('smart_list_indexes', stdout=out, no_color=True)
+        output = out.getvalue()
+        self.assertIn('testproject.views.TestListView (foreign/)\n', output)
+        self.assertIn('  ordering by column 1 (title): sort without index\n', output)
+        self.assertIn('  filter category: sequential scan\n', output)
+        self.assertIn('  filter foreign_1, ordered by category: sort without index\n', output)
+        self.assertIn('  search in title, =category, foreign_1__title: sequential scan\n', output)
+        suggestions = output.split('Suggested Meta.indexes:\n')[1]
+        self.assertEqual(
+            suggestions.splitlines(),
+            [
+                'testproject.SampleModel:',
+                "    models.Index(fields=['title'], name='samplemo_title_idx'),",
+                "    models.Index(fields=['category'], name='samplemo_category_idx'),",
+                "    GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='samplemo_title_trgm'),"
+                "  # django.contrib.postgres.indexes, requires the pg_trgm extension (icontains)",
+                "    models.Index(Upper('category'), name='samplemo_category_upper'),"
+                "  # iexact compares upper case values, Django 3.2+",
+                "    models.Index(fields=['foreign_1', 'category'], name='samplemo_foreign_1_ca_idx'),",
+                'testproject.ForeignModelWithUrl:',
+                "    GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='foreignm_title_trgm'),"
+                "  # django.contrib.postgres.indexes, requires the pg_trgm extension (icontains)",
+            ],
+        )
+
+        out = six.StringIO()
+        call_command('smart_list_indexes', '--no-explain', stdout=out, no_color=True)
+        self.assertNotIn('sort without index', out.getvalue())
+        self.assertNotIn("fields=['foreign_1', 'category']", out.getvalue())
+        self.assertIn("models.Index(fields=['title'], name='samplemo_title_idx')", out.getvalue())
+
     def test_new_filter_clears_pagination(self):
         request = self.factory.get('/smart-lists/?page=2&o=1&category=blog_post')
         smart_list = SmartList(
@@ -300,6 +1219,38 @@ class SmartListTestCase(TestCase):
             ],
         )
 
+    def test_streaming_export_to_excel(self):
+        SampleModel.objects.create(title='test', category='misc', some_date=datetime.date(2020, 1, 2))
+        SampleModel.objects.create(
+            title='a much longer test title', some_datetime=datetime.datetime(2020, 1, 2, 12, tzinfo=pytz.UTC)
+        )
+
+        class SampleModelListView(SmartListMixin, ListView):
+            model = SampleModel
+            list_display = ('id', 'title', 'some_date', 'some_datetime')
+            search_fields = ('title',)
+            export_backends = [
+                SmartListStreamingExcelExportBackend(verbose_name='Export to Excel', file_name='accounts.xlsx')
+            ]
+
+        request = self.factory.get('/smart-lists/?q=test&e=0&o=1')
+        response = SampleModelListView.as_view()(request=request)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], SmartListStreamingExcelExportBackend.content_type)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename=accounts.xlsx')
+        wb = load_workbook(filename=BytesIO(b''.join(response.streaming_content)))
+        data = [[cell.value for cell in row] for row in wb.active.rows]
+        self.assertListEqual(
+            data,
+            [
+                ['Id', 'Title', 'Some Date', 'Some Datetime'],
+                [2, 'test', datetime.datetime(2020, 1, 2), 'None'],
+                [3, 'a much longer test title', 'None', datetime.datetime(2020, 1, 2, 12)],
+            ],
+        )
+        self.assertEqual(wb.active.column_dimensions['B'].width, len('a much longer test title'))
+
 
 class TestSmartListExportBackend(TestCase):
     class DummySmartListExportBackend(SmartListExportBackend):
@@ -338,3 +1289,47 @@ class TestSmartListExportBackend(TestCase):
         self.assertEqual(
             backend.get_content(self.smart_list, value_renderer=str).decode(), 'Id;Title;Category\n1;First;Blog Post'
         )
+
+    def test_chunked_iteration(self):
+        for title in ('a', 'b', 'c'):
+            foreign = ForeignModelWithUrl.objects.create(title=title)
+            SampleModel.objects.create(title='sample ' + title, foreign_1=foreign)
+        queryset = ForeignModelWithUrl.objects.order_by('pk').prefetch_related('samplemodel_set')
+        smart_list = SmartList(queryset, list_display=('title',))
+        backend = self.DummySmartListExportBackend(verbose_name='Test', file_name='test.txt', chunk_size=2)
+
+        with self.assertNumQueries(3):  # the objects, related objects of both chunks
+            items = list(backend.get_items(smart_list))
+        self.assertIsNone(queryset._result_cache)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [[sample.title for sample in item.object.samplemodel_set.all()] for item in items],
+                [['sample a'], ['sample b'], ['sample c']],
+            )
+
+    def test_csv_export(self):
+        backend = SmartListCSVExportBackend(verbose_name='Test', file_name='test.csv')
+        self.assertEqual(backend.content_type, 'text/csv; charset=utf-8')
+        self.assertEqual(
+            b''.join(backend.get_content(self.smart_list, value_renderer=str)).decode(),
+            'Id,Title,Category\r\n1,First,Blog Post\r\n2,Second,Blog Post\r\n',
+        )
+
+    def test_compressed_csv_export(self):
+        backend = SmartListCSVExportBackend(verbose_name='Test', file_name='test.csv.gz', compress=True, limit=1)
+        self.assertEqual(backend.content_type, 'application/gzip')
+        self.assertEqual(
+            gzip.decompress(b''.join(backend.get_content(self.smart_list, value_renderer=str))).decode(),
+            'Id,Title,Category\r\n1,First,Blog Post\r\n',
+        )
+
+    def test_json_lines_export(self):
+        backend = SmartListJSONLinesExportBackend(verbose_name='Test', file_name='test.ndjson')
+        lines = b''.join(backend.get_content(self.smart_list, value_renderer=str)).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [
+                {'Id': '1', 'Title': 'First', 'Category': 'Blog Post'},
+                {'Id': '2', 'Title': 'Second', 'Category': 'Blog Post'},
+            ],
+        )